@@ -0,0 +1,3 @@
+"""CRYPTBARA: dependency-guided detection of Python cryptographic API misuses."""
+
+__version__ = "0.1.0"
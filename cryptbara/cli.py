@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+# subcommand -> (stage directory, module, description). Modules are imported only when their
+# subcommand runs, so `cryptbara <stage>` never pays for openai/requests unless the stage needs them.
+COMMANDS = {
+    "pipeline":     ("scripts", "pipeline", "Full pipeline (static + LLM + summary) in one process"),
+    "flatten":      ("utils", "process_filename", "Flatten a source tree into target/"),
+    "dedup":        ("utils", "dedup", "Cluster duplicate targets and pick representatives"),
+    "joern":        ("scripts", "run_joern_script", "Run the Joern query scripts on one file"),
+    "cpg-store":    ("scripts", "cpg_store", "Persistent CPG store: re-run queries without re-import"),
+    "format":       ("scripts", "JoernUnifiedParser", "Format Joern output of a target"),
+    "ast":          ("scripts", "ast_interflow", "AST interprocedural analysis of one file"),
+    "merge":        ("scripts", "merge", "Merge Joern and AST results of a target"),
+    "call-tree":    ("scripts", "generate_call_tree", "Generate function call chains of a target"),
+    "llm":          ("llm", "run_llm_experiments", "LLM detection with majority vote for one target"),
+    "llm-pack":     ("llm", "packing", "LLM detection with small targets packed into shared requests"),
+    "detect":       ("llm", "llm_detector", "Single LLM detector call"),
+    "rule-index":   ("llm", "rule_index", "Compile the rule-to-API index and show per-target rule selection"),
+    "summary":      ("utils", "result", "Write the session summary CSV"),
+    "schedule":     ("utils", "scheduler", "Risk-ranked target order and budgeted LLM runs"),
+    "evaluate":     ("utils", "evaluate", "Accuracy-vs-cost evaluation and sweeps"),
+    "mock-llm":     ("utils", "mock_llm_server", "OpenAI-compatible mock endpoint"),
+    "daemon":       ("scripts", "analysis_daemon", "Watch-mode daemon with a local API"),
+    "diff-scan":    ("scripts", "incremental", "Scan only files affected by a git diff, reusing a baseline session"),
+    "queue":        ("scripts", "lease_queue", "Distributed workers over a shared-filesystem lease queue"),
+    "profile":      ("utils", "profiling", "Run a stage under the profiler or merge a session's profiles"),
+    "startup-time": (None, "startup", "Measure CLI startup time per subcommand"),
+}
+
+
+def find_project_root():
+    """Directory containing the stage scripts: $CRYPTBARA_HOME, the source checkout, or the cwd"""
+    candidates = [
+        os.environ.get("CRYPTBARA_HOME"),
+        os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+        os.getcwd(),
+    ]
+    for candidate in candidates:
+        if candidate and os.path.isdir(os.path.join(candidate, "scripts")) \
+                and os.path.isdir(os.path.join(candidate, "llm")):
+            return os.path.abspath(candidate)
+    return None
+
+
+def print_usage():
+    print("usage: cryptbara <command> [args...]\n\ncommands:")
+    for name, (_, _, description) in COMMANDS.items():
+        print(f"  {name:<13} {description}")
+    print("\nRun 'cryptbara <command> --help' for the options of a command.")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print_usage()
+        return 0
+    if argv[0] == "--version":
+        from cryptbara import __version__
+        print(f"cryptbara {__version__}")
+        return 0
+
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"[!] Unknown command: {command}")
+        print_usage()
+        return 2
+
+    stage_dir, module_name, _ = COMMANDS[command]
+    if stage_dir is None:
+        from cryptbara import startup
+        return startup.main(args)
+
+    root = find_project_root()
+    if root is None:
+        print("[!] CRYPTBARA sources not found. Run from the project root, install with 'pip install -e .' "
+              "(regular installs only contain the dispatcher), or set CRYPTBARA_HOME to a checkout.")
+        return 1
+
+    # Stage modules import their siblings directly, as when run as 'python3 <dir>/<script>.py'
+    for path in (os.path.join(root, "utils"), os.path.join(root, "llm"), os.path.join(root, stage_dir)):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+    import importlib
+    module = importlib.import_module(module_name)
+    sys.argv = [os.path.join(root, stage_dir, f"{module_name}.py")] + args
+    result = module.main()
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
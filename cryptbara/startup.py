@@ -0,0 +1,56 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_COMMANDS = ["--help", "detect --help", "llm --help", "summary --help", "dedup --help", "pipeline --help"]
+
+
+def measure(command, repeat):
+    """Median wall time (ms) of a fresh `python -m cryptbara <command>` process"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "cryptbara"] + command.split(),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 1)
+
+
+def _time_interpreter():
+    """Wall time (ms) of a bare interpreter start, for reference"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"])
+    return (time.perf_counter() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cryptbara startup-time", description="Measure CLI startup time per subcommand")
+    parser.add_argument("commands", nargs="*", help=f"Commands to time (default: {DEFAULT_COMMANDS})")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command (median is reported)")
+    parser.add_argument("--budget-ms", type=float, help="Exit non-zero if any command exceeds this median")
+    parser.add_argument("--output", help="Append results as a JSON line to this file (for tracking over time)")
+    args = parser.parse_args(argv)
+
+    measure("--help", 1)  # warm the filesystem cache
+    baseline = round(statistics.median([_time_interpreter() for _ in range(args.repeat)]), 1)
+    results = {command: measure(command, args.repeat) for command in (args.commands or DEFAULT_COMMANDS)}
+
+    print(f"{'command':<24} {'median ms':>10}")
+    print(f"{'(bare interpreter)':<24} {baseline:>10}")
+    for command, ms in results.items():
+        print(f"{command:<24} {ms:>10}")
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps({"timestamp": time.time(), "python": sys.version.split()[0],
+                                "interpreter_ms": baseline, "commands": results}) + "\n")
+
+    over = {c: ms for c, ms in results.items() if args.budget_ms is not None and ms > args.budget_ms}
+    if over:
+        print(f"[!] Over budget ({args.budget_ms} ms): {', '.join(over)}")
+        return 1
+    return 0
+
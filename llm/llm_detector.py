@@ -4,32 +4,156 @@ import argparse
 import json
 import os
 import sys
-from openai import OpenAI
-from utils import load_template, load_rules, load_json_file, save_json_file
-from dotenv import load_dotenv
+from utils import load_template, load_rules, load_rule_list, load_json_file, save_json_file
+from rule_index import load_index, read_receiver_trace, render_rules, select_rules, target_apis
+from structured_output import RESPONSE_SCHEMA, StreamingJSONParser, parse_tolerant, response_format, schema_for_experiment
 from pathlib import Path
 
 
 project_root = Path(__file__).resolve().parent.parent
 dotenv_path = project_root / ".env"
-if dotenv_path.exists():
-    load_dotenv(dotenv_path=dotenv_path)
-    
-client = OpenAI()
+
+sys.path.append(str(project_root / "utils"))
+from profiling import profile_stage
+
+# openai/dotenv are imported and the client is built on first use only
+_env_loaded = False
+_client = None
+
+def load_env():
+    """Load the project .env file once"""
+    global _env_loaded
+    if not _env_loaded:
+        _env_loaded = True
+        if dotenv_path.exists():
+            from dotenv import load_dotenv
+            load_dotenv(dotenv_path=dotenv_path)
+
+def get_client():
+    """Return the shared OpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        load_env()
+        from openai import OpenAI
+        _client = OpenAI()
+    return _client
+
+DEFAULT_MODEL = "gpt-4o-mini-2024-07-18"
+DEFAULT_TEMPERATURE = 0
+DEFAULT_MAX_TOKENS = 1500
+
+SYSTEM_PROMPT = "You are a security expert detecting cryptographic API misuses in code."
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def extract_json(result_text):
+    """Parse the JSON object in an LLM reply, repairing truncated or slightly malformed output"""
+    json_start = result_text.find("{")
+    json_end = result_text.rfind("}")
+    if json_start >= 0 and json_end >= 0:
+        json_str = result_text[json_start:json_end + 1]
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            pass
+    if json_start >= 0:
+        repaired = parse_tolerant(result_text[json_start:])
+        if isinstance(repaired, dict):
+            return repaired
+        return {"error": "Failed to parse LLM response as JSON.", "raw_response": result_text}
+    return {"error": "No JSON found in LLM response.", "raw_response": result_text}
+
+def call_llm(prompt, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, max_tokens=DEFAULT_MAX_TOKENS,
+             schema=RESPONSE_SCHEMA, verdict_only=False):
+    """
+    Stream one chat completion. Returns (parsed JSON or error dict, usage dict or None).
+    With a schema the reply is constrained to it (structured output); with verdict_only the
+    stream is closed as soon as the "misuses" array is known to be empty or non-empty.
+    """
+    request = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True,
+        "stream_options": {"include_usage": True}
+    }
+    if schema is not None:
+        request["response_format"] = response_format(schema)
+
+    parser = StreamingJSONParser()
+    chunks = []
+    usage = None
+    stopped_early = False
+    try:
+        stream = get_client().chat.completions.create(**request)
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = {
+                    "prompt_tokens": chunk.usage.prompt_tokens,
+                    "completion_tokens": chunk.usage.completion_tokens,
+                    "total_tokens": chunk.usage.total_tokens
+                }
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content or ""
+            chunks.append(content)
+            if parser.feed(content) and verdict_only:
+                stopped_early = True
+                stream.close()
+                break
+    except Exception as e:
+        return {"error": f"Error during LLM analysis: {str(e)}"}, None
+
+    result_text = "".join(chunks).strip()
+    if not stopped_early:
+        return extract_json(result_text), usage
+
+    result = parser.value() or {}
+    result = {
+        "misuses": result.get("misuses", []),
+        "recommendations": result.get("recommendations", []),
+        "analysis_summary": result.get("analysis_summary", ""),
+        "stopped_early": True
+    }
+    # The usage chunk is never sent for a closed stream
+    if usage is None:
+        prompt_tokens = estimate_tokens(SYSTEM_PROMPT + prompt)
+        completion_tokens = estimate_tokens(result_text)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        result["usage_estimated"] = True
+    return result, usage
 
 class LLMCryptoMisuseDetector:
-    def __init__(self, target, source_file, merged_file, rules_dir, templates_dir, output_dir, experiment, api_key=None, call_chain=None):
+    def __init__(self, target, source_file, merged_file, rules_dir, templates_dir, output_dir, experiment, api_key=None, call_chain=None,
+                 model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, max_tokens=DEFAULT_MAX_TOKENS, max_call_chain=None,
+                 structured=True, verdict_only=False, rule_selection=True):
         self.target = target
         self.source_file = source_file
         self.merged_file = merged_file
         self.rules_dir = rules_dir
         self.templates_dir = templates_dir
         self.output_dir = output_dir
+        load_env()
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.experiment = experiment
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_call_chain = max_call_chain
+        self.structured = structured
+        self.verdict_only = verdict_only
+        self.rule_selection = rule_selection
         self.results = {
             "target": target,
             "source_file": os.path.basename(source_file),
+            "model": model,
             "misuses": [],
             "recommendations": [],
             "analysis_summary": ""
@@ -48,7 +172,15 @@ class LLMCryptoMisuseDetector:
 
         self.merged_results = load_json_file(self.merged_file)
         self.rules_file = os.path.join(self.rules_dir, "rules.json")
-        self.rules = load_rules(self.rules_file)
+        if self.rule_selection:
+            # Only the rules whose APIs occur in the source, receiver trace or merged results, one line each
+            apis = target_apis(self.merged_results, read_receiver_trace(self.merged_file), self.source_code)
+            self.rule_ids = select_rules(apis, load_index(self.rules_file))
+            self.rules = render_rules(load_rule_list(self.rules_file), self.rule_ids)
+        else:
+            self.rule_ids = [rule["id"] for rule in load_rule_list(self.rules_file)]
+            self.rules = load_rules(self.rules_file)
+        self.results["rules_included"] = self.rule_ids
         self.template_file = os.path.join(self.templates_dir, f"{self.experiment}.txt")
         self.template = load_template(self.template_file)
 
@@ -59,6 +191,10 @@ class LLMCryptoMisuseDetector:
         except:
             self.call_chain = "No call chain available"
 
+        # Keep only the first N call chains
+        if self.max_call_chain is not None:
+            self.call_chain = "\n".join(self.call_chain.splitlines()[:self.max_call_chain])
+
     def generate_prompt(self):
         return self.template.format(
             RULE=self.rules,
@@ -71,33 +207,16 @@ class LLMCryptoMisuseDetector:
         if not self.api_key:
             return {"error": "API key is not set."}
 
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini-2024-07-18",
-                messages=[
-                    {"role": "system", "content": "You are a security expert detecting cryptographic API misuses in code."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0,
-                max_tokens=1500
-            )
-            result_text = response.choices[0].message.content.strip()
-            json_start = result_text.find("{")
-            json_end = result_text.rfind("}")
-            if json_start >= 0 and json_end >= 0:
-                json_str = result_text[json_start:json_end + 1]
-                try:
-                    return json.loads(json_str)
-                except json.JSONDecodeError:
-                    return {"error": "Failed to parse LLM response as JSON.", "raw_response": result_text}
-            else:
-                return {"error": "No JSON found in LLM response.", "raw_response": result_text}
-        except Exception as e:
-            return {"error": f"Error during LLM analysis: {str(e)}"}
+        result, usage = call_llm(prompt, self.model, self.temperature, self.max_tokens,
+                                 schema_for_experiment(self.experiment) if self.structured else None, self.verdict_only)
+        if usage is not None:
+            self.results["usage"] = usage
+        return result
 
     def run(self):
         # Save the generated prompt for reference
-        prompt = self.generate_prompt()
+        with profile_stage("generate_prompt", self.target):
+            prompt = self.generate_prompt()
         prompt_path = os.path.join(self.output_dir, "prompt.txt")
         with open(prompt_path, 'w', encoding='utf-8') as f:
             f.write(prompt)
@@ -118,6 +237,9 @@ class LLMCryptoMisuseDetector:
                 "recommendations": llm_response.get("recommendations", []),
                 "analysis_summary": llm_response.get("analysis_summary", "")
             })
+            for flag in ("stopped_early", "usage_estimated"):
+                if llm_response.get(flag):
+                    self.results[flag] = True
 
         results_path = os.path.join(self.output_dir, "llm_results.json")
         save_json_file(self.results, results_path)
@@ -125,7 +247,7 @@ class LLMCryptoMisuseDetector:
         return self.results
 
 
-def main():
+def build_arg_parser():
     parser = argparse.ArgumentParser(description="LLM-based cryptographic misuse detector")
     parser.add_argument("--target", required=True, help="Target identifier")
     parser.add_argument("--source", required=True, help="Path to source code file")
@@ -136,7 +258,19 @@ def main():
     parser.add_argument("--api-key", help="OpenAI API key (or use environment variable)")
     parser.add_argument("--experiment", required=True, help="Experiment setting (Z1, F1, C1, C2)")
     parser.add_argument("--call_chain", help="Path to function call chain file")
-    args = parser.parse_args()
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Model name (default: {DEFAULT_MODEL})")
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE, help="Sampling temperature")
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS, help="Maximum completion tokens")
+    parser.add_argument("--max-call-chain", type=int, help="Maximum number of call chains included in the prompt")
+    parser.add_argument("--no-structured", action="store_true", help="Do not request schema-constrained output (for endpoints without support)")
+    parser.add_argument("--verdict-only", action="store_true", help="Stop generation once the verdict (misuses empty or not) is known")
+    parser.add_argument("--all-rules", action="store_true", help="Include every rule (pretty-printed JSON) instead of those matching the target's APIs")
+    return parser
+
+
+def run_cli(argv=None):
+    """Parse detector arguments and run one analysis (also used in-process by long-running workers)"""
+    args = build_arg_parser().parse_args(argv)
 
     os.makedirs(args.output, exist_ok=True)
 
@@ -145,10 +279,21 @@ def main():
         args.rules, args.templates, args.output,
         args.experiment,
         args.api_key,
-        args.call_chain
+        args.call_chain,
+        args.model,
+        args.temperature,
+        args.max_tokens,
+        args.max_call_chain,
+        not args.no_structured,
+        args.verdict_only,
+        not args.all_rules
     )
 
-    results = detector.run()
+    return detector.run()
+
+
+def main():
+    results = run_cli()
 
     if "error" in results:
         try:
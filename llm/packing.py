@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from llm_detector import LLMCryptoMisuseDetector, call_llm, estimate_tokens
+from run_llm_experiments import (RULES_DIR, SRC_DIR, TEMPLATE_DIR, load_cascade, majority_vote,
+                                 needs_escalation, run_experiment, write_decision)
+from structured_output import packed_schema
+from rule_index import render_rules
+from utils import load_rule_list, load_rules, load_template, save_json_file
+
+PACK_TEMPLATE = "C1_packed.txt"
+PACKED_PREFIX = "llm_results_packed"  # packed runs never share file names with the single-target stages
+DEFAULT_PACK_BUDGET = 6000   # estimated prompt tokens of target sections per packed request
+DEFAULT_SMALL_TARGET = 1500  # targets estimated above this are always sent alone
+
+
+def render_target(detector):
+    """Per-target section of a packed prompt (same content as the C1 template)"""
+    return (
+        f'<target name="{detector.target}">\n'
+        f"<code>\n{detector.source_code}\n</code>\n\n"
+        f"<dependency>\n{json.dumps(detector.merged_results, indent=2)}\n</dependency>\n\n"
+        f"<call_chain>\n{detector.call_chain}\n</call_chain>\n"
+        f"</target>"
+    )
+
+
+def build_packs(sections, budget, small_limit):
+    """Greedily group small targets up to the token budget. Returns (packs, single_targets)."""
+    packs, singles = [], []
+    current, current_tokens = [], 0
+    for target, section in sections.items():
+        tokens = estimate_tokens(section)
+        if tokens > small_limit or tokens > budget:
+            singles.append(target)
+            continue
+        if current and current_tokens + tokens > budget:
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(target)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+
+    # A pack of one is just a single-target request
+    for pack in [p for p in packs if len(p) == 1]:
+        packs.remove(pack)
+        singles.extend(pack)
+    return packs, singles
+
+
+def apportion(value, weights, ndigits=None):
+    """Split value in proportion to weights; the rounded shares still add up to value"""
+    total_weight = sum(weights.values())
+    targets = list(weights)
+    shares = {t: round(value * weights[t] / total_weight, ndigits) for t in targets[:-1]}
+    shares[targets[-1]] = round(value - sum(shares.values()), ndigits)
+    return shares
+
+
+def run_pack(pack_id, pack, detectors, sections, stage, pack_dir):
+    """
+    Send one packed request per repetition and split the keyed response into each target's
+    llm_results_packed_run<N>.json. Each request's call and usage are shared by its targets in
+    proportion to their sections, so they are counted once in total. A response that cannot be
+    parsed at all ends the pack early. Returns {target: (decisions, errors, usage, calls)}.
+    """
+    # The union of the rules selected for each packed target
+    rules_path = os.path.join(RULES_DIR, "rules.json")
+    rule_ids = sorted(set().union(*(detectors[t].rule_ids for t in pack)))
+    rules = load_rules(rules_path) if stage.get("all_rules") else render_rules(load_rule_list(rules_path), rule_ids)
+    template = load_template(os.path.join(TEMPLATE_DIR, PACK_TEMPLATE))
+    prompt = template.format(RULE=rules, TARGETS="\n\n".join(sections[t] for t in pack))
+
+    os.makedirs(pack_dir, exist_ok=True)
+    with open(os.path.join(pack_dir, "prompt.txt"), "w", encoding="utf-8") as f:
+        f.write(prompt)
+    save_json_file({"pack": pack_id, "targets": pack, "stage": stage, "rules_included": rule_ids},
+                   os.path.join(pack_dir, "pack.json"))
+
+    # Cost is apportioned by each target's share of the packed sections
+    weights = {t: estimate_tokens(sections[t]) for t in pack}
+    call_shares = apportion(1, weights, 4)
+
+    outcome = {t: ([], 0, {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}, 0) for t in pack}
+    schema = packed_schema(pack) if stage.get("structured", True) else None
+    repeat_count = stage.get("repeat_count", 5)
+    for i in range(repeat_count):
+        print(f"[→] Pack {pack_id} ({len(pack)} targets) repetition {i+1}/{repeat_count}")
+        response, usage = call_llm(prompt, stage["model"], stage.get("temperature", 0),
+                                   stage.get("max_tokens", 1500) * len(pack), schema)
+        save_json_file(response, os.path.join(pack_dir, f"raw_response_run{i+1}.json"))
+        keyed = response.get("targets") if isinstance(response.get("targets"), dict) else None
+
+        usage_shares = {key: apportion(value, weights) for key, value in usage.items()} if usage else None
+
+        for target in pack:
+            decisions, errors, target_usage, calls = outcome[target]
+            results = dict(detectors[target].results, packed_with=pack, rules_included=rule_ids)
+            if usage_shares:
+                results["usage"] = {key: shares[target] for key, shares in usage_shares.items()}
+                for key in target_usage:
+                    target_usage[key] += results["usage"].get(key, 0)
+
+            entry = keyed.get(target) if keyed else None
+            if isinstance(entry, dict):
+                results.update({
+                    "misuses": entry.get("misuses", []),
+                    "recommendations": entry.get("recommendations", []),
+                    "analysis_summary": entry.get("analysis_summary", "")
+                })
+                decisions.append("vuln" if results["misuses"] else "safe")
+            else:
+                results["error"] = response.get("error", "Target missing from packed response.")
+                decisions.append("error")
+                errors += 1
+
+            save_json_file(results, os.path.join(detectors[target].output_dir, f"{PACKED_PREFIX}_run{i+1}.json"))
+            outcome[target] = (decisions, errors, target_usage, round(calls + call_shares[target], 4))
+
+        if keyed is None:
+            # Every target would fall back anyway; do not pay for the remaining repetitions
+            print(f"[!] Pack {pack_id}: unparsable response, skipping the remaining repetitions")
+            break
+
+    return outcome
+
+
+def run_packed(session_tag, targets, budget=DEFAULT_PACK_BUDGET, small_limit=DEFAULT_SMALL_TARGET, cascade_path=None):
+    """Analyse targets with packed requests, falling back to single-target requests where needed"""
+    merged_base = os.path.join("run_results", session_tag, "outputs")
+    llm_output_base = os.path.join("run_results", session_tag, "outputs_llm")
+    packs_base = os.path.join("run_results", session_tag, "llm_packs")
+    stages = load_cascade(cascade_path)["stages"]
+    stage = stages[0]
+
+    detectors, sections = {}, {}
+    for target in targets:
+        output_dir = os.path.join(llm_output_base, target, "C1")
+        os.makedirs(output_dir, exist_ok=True)
+        detector = LLMCryptoMisuseDetector(
+            target, os.path.join(SRC_DIR, f"{target}.py"),
+            os.path.join(merged_base, target, "merged_results.json"),
+            RULES_DIR, TEMPLATE_DIR, output_dir, "C1",
+            call_chain=os.path.join(merged_base, target, "function_call_chains.txt"),
+            model=stage["model"], temperature=stage.get("temperature", 0), max_tokens=stage.get("max_tokens", 1500),
+            rule_selection=not stage.get("all_rules")
+        )
+        detectors[target] = detector
+        sections[target] = render_target(detector)
+
+    packs, singles = build_packs(sections, budget, small_limit)
+    print(f"[+] {len(targets)} targets → {len(packs)} packed request(s) + {len(singles)} single-target")
+
+    # target -> (packed path entry, wall time, first cascade stage) of targets sent as single-target requests
+    fallback = {target: None for target in singles}
+    for pack_id, pack in enumerate(packs, start=1):
+        started = time.time()
+        outcome = run_pack(pack_id, pack, detectors, sections, stage, os.path.join(packs_base, f"pack_{pack_id}"))
+        elapsed = (time.time() - started) / len(pack)
+
+        for target in pack:
+            decisions, errors, usage, calls = outcome[target]
+            votes = [d for d in decisions if d != "error"]
+            final_decision = majority_vote(votes) if votes else None
+
+            # Unparsable packed output goes single-target, and an inconclusive vote to the next cascade stage
+            escalate = bool(errors) or (len(stages) > 1 and needs_escalation(stage, votes, errors, final_decision))
+            step = {
+                "stage": f"{stage['name']} (packed)",
+                "model": stage["model"],
+                "decisions": decisions,
+                "errors": errors,
+                "calls": calls,
+                "usage": usage,
+                "decision": final_decision,
+                "escalated": escalate,
+                "packed_with": pack,
+                "results_prefix": PACKED_PREFIX
+            }
+            if escalate:
+                # Failed output is retried alone on the same stage; a split vote would only repeat itself there
+                start_stage = 0 if errors else 1
+                print(f"[!] {target}: packed result {'unparsable' if errors else 'inconclusive'}, "
+                      f"falling back to single-target requests from stage {stages[start_stage]['name']}")
+                fallback[target] = (step, elapsed, start_stage)
+                continue
+            write_decision(detectors[target].output_dir, target, [step], final_decision, usage, elapsed)
+
+    # The packed attempt stays in cascade_path.json, so its tokens and calls are still counted
+    for target, packed in fallback.items():
+        prior_path, prior_wall_time, start_stage = ([packed[0]], packed[1], packed[2]) if packed else (None, 0.0, 0)
+        run_experiment(target, "C1", session_tag, cascade_path, prior_path=prior_path, prior_wall_time=prior_wall_time,
+                       start_stage=start_stage)
+
+
+def select_targets(session_tag, only=None):
+    """Targets with non-empty merged results (same selection as run_llm.sh)"""
+    merged_base = os.path.join("run_results", session_tag, "outputs")
+    targets = []
+    for merged_file in sorted(glob.glob(os.path.join(merged_base, "*", "merged_results.json"))):
+        target = os.path.basename(os.path.dirname(merged_file))
+        if only and target not in only:
+            continue
+        with open(merged_file, "r") as f:
+            if "".join(f.read().split()) == "{}":
+                print(f"[!] Skipping empty result: {merged_file}")
+                continue
+        targets.append(target)
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM detection with small targets packed into shared requests")
+    parser.add_argument("--session", required=True, help="Session tag")
+    parser.add_argument("--budget", type=int, default=DEFAULT_PACK_BUDGET,
+                        help=f"Estimated tokens of target sections per packed request (default: {DEFAULT_PACK_BUDGET})")
+    parser.add_argument("--small-limit", type=int, default=DEFAULT_SMALL_TARGET,
+                        help=f"Targets above this many estimated tokens are sent alone (default: {DEFAULT_SMALL_TARGET})")
+    parser.add_argument("--cascade", help="Cascade configuration JSON (its first stage is used for packed requests)")
+    parser.add_argument("--target", action="append", help="Restrict to these targets (repeatable)")
+    args = parser.parse_args()
+
+    if not os.environ.get("OPENAI_API_KEY"):
+        print("[!] OPENAI_API_KEY is not set.")
+        sys.exit(1)
+
+    targets = select_targets(args.session, args.target)
+    if not targets:
+        print("[!] No targets with merged results found")
+        sys.exit(1)
+    run_packed(args.session, targets, args.budget, args.small_limit, args.cascade)
+
+
+if __name__ == "__main__":
+    main()
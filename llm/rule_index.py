@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+
+from utils import load_rule_list
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+RULES_PATH = os.path.join(SCRIPT_DIR, "rules", "rules.json")
+CLASSES_PATH = os.path.join(PROJECT_ROOT, "utils", "filtered_classes.txt")
+INDEX_NAME = "rule_index.json"
+
+# rules.json category -> (pattern over lower-cased filtered_classes.txt entries, extra API names
+# that are not classes). Identifiers of the rule's misuse/safe examples are added as well.
+CATEGORY_APIS = {
+    "Symmetric Cipher Security": (
+        r"^aes|arc4|^(des|des3|tripledes|rc4|blowfish|cast)$|camellia|^sm4$|chacha|salsa|cipher|secretbox|^box$",
+        ["des", "des3", "tripledes", "arc2", "rc4", "blowfish", "cast5", "idea", "algorithms", "fernet"]),
+    "Asymmetric Cipher Security": (
+        r"rsa|dsa|^ecc|^ec(lib|dsa)?$|elliptic|ed25519|ed448|x25519|x448|^dh|elgamal|privatekey|publickey|"
+        r"sigscheme|signingkey|verifykey|curve",
+        ["ec", "generate_private_key", "key_size", "secp256r1", "secp192r1"]),
+    "Cryptographic Hash Security": (
+        r"^md\d|sha\d|^sha3|shake|blake|ripemd|keccak|^sm3$|hash|^hashlib$",
+        ["sha", "hashes", "sha3_256", "digest", "hexdigest"]),
+    "Mode of Operation": (
+        r"^(ecb|cbc|cfb|cfb8|ofb|ctr|gcm|xts)$|mode",
+        ["modes", "mode_ecb", "mode_cbc", "mode_cfb", "mode_ofb", "mode_ctr", "mode_gcm", "mode_eax",
+         "mode_ccm", "mode_ocb", "mode_siv", "mode_openpgp"]),
+    "Key Management": (
+        r"^aes|arc4|chacha|salsa|cipher|secretbox|rsa|dsa|^ecc|elliptic|privatekey|hmac|cmac|kdf|poly1305|"
+        r"signingkey|^fernet$",
+        ["key", "secret", "secret_key", "password", "passphrase", "fernet", "hmac", "generate_key"]),
+    "PRNG Quality": (
+        r"random|rng",
+        ["randint", "randrange", "choice", "choices", "getrandbits", "shuffle", "uniform"]),
+    "Seed Management": (
+        r"^random$|strongrandom",
+        ["seed"]),
+    "IV Management": (
+        r"^(cbc|cfb|cfb8|ofb|ctr|gcm)$|^(cbc|cfb|ofb|ctr|gcm|eax|ocb|ccm)mode$|initializationvector|nonce|"
+        r"^aes|chacha|salsa",
+        ["iv", "nonce", "mode_cbc", "mode_cfb", "mode_ofb", "mode_ctr", "mode_gcm", "mode_eax", "mode_ccm",
+         "initialization_vector"]),
+    "Salt Management": (
+        r"kdf|scrypt|argon|bcrypt|pbkdf",
+        ["salt", "pbkdf2_hmac", "pbkdf2", "scrypt", "hashpw", "gensalt", "kdf"]),
+    "PBE Iteration Count": (
+        r"pbkdf|^scrypt$|argon|bcrypt",
+        ["iterations", "rounds", "pbkdf2_hmac", "pbkdf2"]),
+    "Secure Configuration Mode": (
+        r"chacha|salsa|poly1305|^ctr$|ctrmode",
+        ["chacha20", "chacha20_poly1305", "salsa20", "mode_ctr"]),
+}
+
+# Example identifiers too generic to tie a target to a rule
+GENERIC_WORDS = {"new", "key", "os", "time", "urandom", "secrets", "token_bytes"}
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_STRING_LITERAL = re.compile(r"[rbuf]*(\"[^\"]*\"|'[^']*')", re.IGNORECASE)
+_index_cache = {}
+
+
+def _identifiers(text):
+    return {word.lower() for word in _IDENTIFIER.findall(text)}
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_index(rules_path=RULES_PATH, classes_path=CLASSES_PATH):
+    """{rule id: lower-cased API/class names} from rules.json categories and filtered_classes.txt"""
+    with open(classes_path, "r") as f:
+        classes = [line.strip().lower() for line in f if line.strip()]
+
+    rules = {}
+    for rule in load_rule_list(rules_path):
+        pattern, extra = CATEGORY_APIS.get(rule["category"], (None, []))
+        apis = set(extra)
+        if pattern:
+            apis.update(c for c in classes if re.search(pattern, c))
+        examples = _STRING_LITERAL.sub(" ", f"{rule.get('misuse_example', '')} {rule.get('safe_example', '')}")
+        apis.update(_identifiers(examples) - GENERIC_WORDS)
+        rules[str(rule["id"])] = {"category": rule["category"], "apis": sorted(apis)}
+
+    return {
+        "sources": {"rules.json": _sha256(rules_path), "filtered_classes.txt": _sha256(classes_path)},
+        "rules": rules
+    }
+
+
+def cache_dir():
+    """Per-user cache for indexes recompiled at runtime (the source tree is never written)"""
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "cryptbara")
+
+
+def _read_index(index_path, sources):
+    """The index at index_path if it was compiled from these sources, else None"""
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("sources") == sources else None
+
+
+def load_index(rules_path=RULES_PATH, classes_path=CLASSES_PATH):
+    """
+    The compiled index shipped next to rules.json (`rule_index.py build`). If its sources changed, the
+    index is recompiled once and cached in the user cache directory.
+    """
+    key = (os.path.abspath(rules_path), os.path.getmtime(rules_path), os.path.getmtime(classes_path))
+    if key in _index_cache:
+        return _index_cache[key]
+
+    sources = {"rules.json": _sha256(rules_path), "filtered_classes.txt": _sha256(classes_path)}
+    cache_path = os.path.join(cache_dir(), f"rule_index_{sources['rules.json'][:16]}.json")
+    index = _read_index(os.path.join(os.path.dirname(rules_path), INDEX_NAME), sources) \
+        or _read_index(cache_path, sources)
+    if index is None:
+        index = compile_index(rules_path, classes_path)
+        try:
+            os.makedirs(cache_dir(), exist_ok=True)
+            write_index(index, cache_path)
+        except OSError:
+            pass
+    _index_cache[key] = index
+    return index
+
+
+def write_index(index, index_path):
+    # Written aside and renamed, so concurrent workers never read a partial index
+    tmp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def _strings(value):
+    """Every key and string value of a JSON document"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key)
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+    elif isinstance(value, str):
+        yield value
+
+
+def target_apis(merged_results, receiver_trace="", source_code=""):
+    """
+    Lower-cased identifiers in a target's receiver trace, merged results and source (imports, calls and
+    string literals such as hashlib.new('md5')); the static stages miss e.g. DES.MODE_ECB attributes.
+    """
+    return _identifiers(receiver_trace) | _identifiers("\n".join(_strings(merged_results))) | _identifiers(source_code)
+
+
+def select_rules(apis, index):
+    """Sorted ids of the rules whose APIs occur in the target; all rules if none do"""
+    selected = [int(rule_id) for rule_id, entry in index["rules"].items() if apis & set(entry["apis"])]
+    return sorted(selected) if selected else sorted(int(rule_id) for rule_id in index["rules"])
+
+
+def render_rules(rules, ids=None):
+    """One line per rule instead of the pretty-printed JSON"""
+    lines = []
+    for rule in rules:
+        if ids is not None and rule["id"] not in ids:
+            continue
+        lines.append(
+            f"[{rule['id']}] {rule['category']} ({rule.get('severity', '')}): {rule.get('threat', '')}. "
+            f"Check: {'; '.join(rule.get('checkpoints', []))}. "
+            f"Misuse: {rule.get('misuse_example', '')}. Safe: {rule.get('safe_example', '')}"
+        )
+    return "\n".join(lines)
+
+
+def read_receiver_trace(merged_file):
+    """Joern receiver trace next to a target's merged_results.json ('' if absent)"""
+    path = os.path.join(os.path.dirname(merged_file), "joern", "receiver_trace_output.txt")
+    try:
+        with open(path, "r", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-to-API index for per-target rule selection")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("build", help=f"Compile llm/rules/{INDEX_NAME}")
+    select_parser = subparsers.add_parser("select", help="Show the rules selected for a session's targets")
+    select_parser.add_argument("--session", required=True, help="Session tag")
+    select_parser.add_argument("--target", action="append", help="Restrict to these targets (repeatable)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = compile_index()
+        for rule_id, entry in index["rules"].items():
+            print(f"[+] {rule_id}. {entry['category']}: {len(entry['apis'])} APIs")
+        print(f"[✓] Rule index written to {write_index(index, os.path.join(os.path.dirname(RULES_PATH), INDEX_NAME))}")
+        return
+
+    index = load_index()
+    rules = load_rule_list(RULES_PATH)
+    all_tokens = len(json.dumps(rules, indent=2)) // 4 + 1
+    merged_files = glob.glob(os.path.join("run_results", args.session, "outputs", "*", "merged_results.json"))
+    for merged_file in sorted(merged_files):
+        target = os.path.basename(os.path.dirname(merged_file))
+        if args.target and target not in args.target:
+            continue
+        with open(merged_file, "r") as f:
+            merged = json.load(f)
+        try:
+            with open(os.path.join("target", f"{target}.py"), "r", errors="replace") as f:
+                source_code = f.read()
+        except OSError:
+            source_code = ""
+        ids = select_rules(target_apis(merged, read_receiver_trace(merged_file), source_code), index)
+        tokens = len(render_rules(rules, ids)) // 4 + 1
+        print(f"[+] {target}: rules {ids} (~{tokens} of ~{all_tokens} rule tokens)")
+
+
+if __name__ == "__main__":
+    main()
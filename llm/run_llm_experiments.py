@@ -1,7 +1,9 @@
 import os
 import sys
+import argparse
 import subprocess
 import json
+import time
 from collections import Counter
 
 EXPERIMENTS = {
@@ -9,6 +11,18 @@ EXPERIMENTS = {
         "desc": "Code + Rule + Call Chain",
         "template": "C1.txt",
         "requires": ["code", "rule", "merged", "call_chain"]
+    },
+    "F1": {
+        "desc": "Code + Rule",
+        "template": "F1.txt",
+        "templates_dir": "llm/evaluation_templates",
+        "requires": ["code", "rule"]
+    },
+    "Z1": {
+        "desc": "Code only (zero-shot)",
+        "template": "Z1.txt",
+        "templates_dir": "llm/evaluation_templates",
+        "requires": ["code"]
     }
 }
 
@@ -16,6 +30,19 @@ RULES_DIR = "llm/rules"
 TEMPLATE_DIR = "llm/templates"
 SRC_DIR = "target"
 
+# Single stage equivalent to the original fixed configuration
+DEFAULT_CASCADE = {
+    "stages": [
+        {
+            "name": "default",
+            "model": "gpt-4o-mini-2024-07-18",
+            "temperature": 0,
+            "max_tokens": 1500,
+            "repeat_count": 5
+        }
+    ]
+}
+
 def resolve_session_tag(cli_session_tag=None):
     if cli_session_tag:
         return cli_session_tag
@@ -26,12 +53,120 @@ API_KEY = os.environ.get("OPENAI_API_KEY")
 def majority_vote(results):
     count = Counter(results)
     most_common, freq = count.most_common(1)[0]
-    return most_common if freq >= 2 else 'UNCERTAIN'
+    # A single repetition is its own majority
+    return most_common if freq >= min(2, len(results)) else 'UNCERTAIN'
+
+def load_cascade(cascade_path=None):
+    """Load a cascade configuration (list of stages, cheapest first)"""
+    if not cascade_path:
+        return DEFAULT_CASCADE
+    with open(cascade_path, "r") as f:
+        cascade = json.load(f)
+    if not cascade.get("stages"):
+        raise ValueError(f"No stages defined in {cascade_path}")
+    return cascade
+
+def needs_escalation(stage, decisions, errors, final_decision):
+    """A stage is inconclusive if any response failed to parse or the votes are split"""
+    if errors or not decisions or final_decision == "UNCERTAIN":
+        return True
+    agreement = Counter(decisions)[final_decision] / len(decisions)
+    return agreement < stage.get("min_agreement", 1.0)
+
+def results_prefix(stage, stage_index):
+    """Run file prefix of a cascade stage; the first stage keeps the original run file names"""
+    return "llm_results" if stage_index == 0 else f"llm_results_{stage['name']}"
+
+def run_detector_subprocess(cmd):
+    """Default runner: one detector process per repetition"""
+    subprocess.run(cmd, text=True)
+
+def run_stage(cmd, stage, stage_index, output_dir, runner=run_detector_subprocess):
+    """Run one cascade stage and return (decisions, errors, usage, calls); a run without output counts as an error"""
+    stage_cmd = cmd + [
+        "--model", stage["model"],
+        "--temperature", str(stage.get("temperature", 0)),
+        "--max-tokens", str(stage.get("max_tokens", 1500))
+    ]
+    if not stage.get("structured", True):
+        stage_cmd.append("--no-structured")
+    if stage.get("verdict_only"):
+        stage_cmd.append("--verdict-only")
+    if stage.get("all_rules"):
+        stage_cmd.append("--all-rules")
+    prefix = results_prefix(stage, stage_index)
+    repeat_count = stage.get("repeat_count", 5)
+
+    decisions, errors = [], 0
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    calls = 0
+
+    for i in range(repeat_count):
+        print(f"[→] Stage {stage['name']} ({stage['model']}) repetition {i+1}/{repeat_count}")
+        print(f"[+] Executing: {' '.join(stage_cmd)}")
+        runner(stage_cmd)
+
+        base_result = os.path.join(output_dir, "llm_results.json")
+        run_result = os.path.join(output_dir, f"{prefix}_run{i+1}.json")
+
+        if not os.path.exists(base_result):
+            print(f"[!] No llm_results.json found after run {i+1}")
+            decisions.append("error")
+            errors += 1
+            continue
+
+        os.replace(base_result, run_result)
+        with open(run_result, "r") as f:
+            data = json.load(f)
+        calls += 1
+        for key in usage:
+            usage[key] += data.get("usage", {}).get(key, 0)
 
-def run_experiment(target_name, experiment_key, session_tag):
+        if "error" in data:
+            errors += 1
+            decisions.append("error")
+        else:
+            decisions.append("vuln" if data.get("misuses") else "safe")
+
+    return decisions, errors, usage, calls
+
+def write_decision(output_dir, target_name, path, final_decision, total_usage, wall_time):
+    """Write cascade_path.json and final_decision.txt for one target"""
+    save_path = os.path.join(output_dir, "cascade_path.json")
+    with open(save_path, "w") as f:
+        json.dump({
+            "target": target_name,
+            "stages": path,
+            "final_decision": final_decision,
+            # Packed requests are shared by their targets, so a step may hold a fraction of a call
+            "total_calls": round(sum(step["calls"] for step in path), 4),
+            "total_usage": total_usage,
+            "wall_time": round(wall_time, 3)
+        }, f, indent=2)
+
+    if final_decision:
+        print(f"[✓] Final Decision: {final_decision}")
+        with open(os.path.join(output_dir, "final_decision.txt"), "w") as f:
+            f.write("Repetition Results:\n")
+            for step in path:
+                if len(path) > 1:
+                    f.write(f"[{step['stage']} / {step['model']}]\n")
+                for idx, res in enumerate(step["decisions"], start=1):
+                    f.write(f"{idx}: {res}\n")
+            f.write(f"\nFinal Decision: {final_decision}\n")
+    else:
+        print("[!] No valid results collected for majority vote")
+
+def run_experiment(target_name, experiment_key, session_tag, cascade_path=None, llm_output_base=None, max_call_chain=None,
+                   runner=run_detector_subprocess, prior_path=None, prior_wall_time=0.0, start_stage=0):
+    """
+    Run the cascade for one target. prior_path lists stages already spent on it elsewhere (e.g. a
+    packed attempt); they are recorded first and their usage, calls and time count toward the totals.
+    start_stage skips cascade stages the prior attempt already stood in for.
+    """
     run_results_dir = f"run_results/{session_tag}"
     merged_base = os.path.join(run_results_dir, "outputs")
-    llm_output_base = os.path.join(run_results_dir, "outputs_llm")
+    llm_output_base = llm_output_base or os.path.join(run_results_dir, "outputs_llm")
     skipped_log_path = os.path.join(merged_base, "skipped_targets_llm.txt")
 
     os.makedirs(merged_base, exist_ok=True)
@@ -59,64 +194,75 @@ def run_experiment(target_name, experiment_key, session_tag):
         "--target", target_name,
         "--source", target_file,
         "--rules", RULES_DIR,
-        "--templates", TEMPLATE_DIR,
+        "--templates", config.get("templates_dir", TEMPLATE_DIR),
         "--output", output_dir,
         "--experiment", experiment_key,
         "--merged", merged_file,
         "--call_chain", call_chain
     ]
 
+    if max_call_chain is not None:
+        cmd += ["--max-call-chain", str(max_call_chain)]
+
     if API_KEY:
         cmd += ["--api-key", API_KEY]
 
-    decision_results = []
-    repeat_count = 5  # Number of repetitions
+    started = time.time()
+    stages = load_cascade(cascade_path)["stages"]
+    path = list(prior_path or [])
+    total_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for step in path:
+        for key in total_usage:
+            total_usage[key] += step["usage"].get(key, 0)
+    final_decision = None
 
-    for i in range(repeat_count):
-        print(f"[→] Repetition {i+1}/{repeat_count}")
-        print(f"[+] Executing: {' '.join(cmd)}")
-        subprocess.run(cmd, text=True)
+    for stage_index, stage in enumerate(stages[start_stage:], start=start_stage):
+        decisions, errors, usage, calls = run_stage(cmd, stage, stage_index, output_dir, runner)
+        for key in total_usage:
+            total_usage[key] += usage[key]
 
-        base_result = os.path.join(output_dir, "llm_results.json")
-        run_result = os.path.join(output_dir, f"llm_results_run{i+1}.json")
-
-        if os.path.exists(base_result):
-            os.rename(base_result, run_result)
-            with open(run_result, "r") as f:
-                data = json.load(f)
-                decision = "vuln" if data.get("misuses") else "safe"
-                decision_results.append(decision)
-        else:
-            print(f"[!] No llm_results.json found after run {i+1}")
-            if i == 0:
-                with open(skipped_log_path, "a") as skip_log:
-                    skip_log.write(f"{target_name}\n")
-                return False
+        votes = [d for d in decisions if d != "error"]
+        final_decision = majority_vote(votes) if votes else None
+        is_last = stage_index == len(stages) - 1
+        escalate = not is_last and needs_escalation(stage, votes, errors, final_decision)
 
-    if decision_results:
-        final_decision = majority_vote(decision_results)
-        print(f"[✓] Final Decision: {final_decision}")
-        with open(os.path.join(output_dir, "final_decision.txt"), "w") as f:
-            f.write("Repetition Results:\n")
-            for idx, res in enumerate(decision_results, start=1):
-                f.write(f"{idx}: {res}\n")
-            f.write(f"\nFinal Decision: {final_decision}\n")
-    else:
-        print("[!] No valid results collected for majority vote")
+        path.append({
+            "stage": stage["name"],
+            "model": stage["model"],
+            "decisions": decisions,
+            "errors": errors,
+            "calls": calls,
+            "usage": usage,
+            "decision": final_decision,
+            "escalated": escalate,
+            "results_prefix": results_prefix(stage, stage_index)
+        })
+        print(f"[+] Stage {stage['name']}: {final_decision} ({'escalating' if escalate else 'accepted'})")
+        if not escalate:
+            break
+
+    write_decision(output_dir, target_name, path, final_decision, total_usage, time.time() - started + prior_wall_time)
 
+    # Skipped only if the detector never produced a result
+    if not any(step["calls"] for step in path):
+        with open(skipped_log_path, "a") as skip_log:
+            skip_log.write(f"{target_name}\n")
+        return False
     return True
 
 def main():
-    if len(sys.argv) < 4:
-        print("Usage: python3 run_llm_experiments.py <target_name> <experiment_key> <session_tag>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python3 run_llm_experiments.py <target_name> <experiment_key> <session_tag> [--cascade PATH]")
+    parser.add_argument("target_name")
+    parser.add_argument("experiment_key")
+    parser.add_argument("session_tag")
+    parser.add_argument("--cascade", help="Cascade configuration JSON (default: single gpt-4o-mini stage)")
+    args = parser.parse_args()
 
-    target_name = sys.argv[1]
-    experiment_key = sys.argv[2]
-    session_tag = resolve_session_tag(sys.argv[3])
+    target_name = args.target_name
+    session_tag = resolve_session_tag(args.session_tag)
 
-    experiment_key = "C1"
-    success = run_experiment(target_name, experiment_key, session_tag)
+    experiment_key = args.experiment_key if args.experiment_key in EXPERIMENTS else "C1"
+    success = run_experiment(target_name, experiment_key, session_tag, args.cascade)
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
@@ -0,0 +1,207 @@
+import json
+import re
+
+SEVERITIES = ["High", "Medium", "Low"]
+
+MISUSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "category": {"type": "string"},
+        "location": {"type": "string"},
+        "description": {"type": "string"},
+        "severity": {"type": "string", "enum": SEVERITIES}
+    },
+    "required": ["id", "category", "location", "description", "severity"],
+    "additionalProperties": False
+}
+
+# Without rules in the prompt (Z1) a misuse is described by a free-form type instead of a rule id/category
+TYPED_MISUSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string"},
+        "location": {"type": "string"},
+        "description": {"type": "string"},
+        "severity": {"type": "string", "enum": SEVERITIES}
+    },
+    "required": ["type", "location", "description", "severity"],
+    "additionalProperties": False
+}
+
+
+def response_schema(misuse_schema=MISUSE_SCHEMA):
+    # "misuses" comes first so the verdict is known as early as possible in the stream
+    return {
+        "type": "object",
+        "properties": {
+            "misuses": {"type": "array", "items": misuse_schema},
+            "recommendations": {"type": "array", "items": {"type": "string"}},
+            "analysis_summary": {"type": "string"}
+        },
+        "required": ["misuses", "recommendations", "analysis_summary"],
+        "additionalProperties": False
+    }
+
+
+RESPONSE_SCHEMA = response_schema(MISUSE_SCHEMA)
+
+# Experiments whose template asks for a different misuse format than the rule-based one
+EXPERIMENT_SCHEMAS = {"Z1": response_schema(TYPED_MISUSE_SCHEMA)}
+
+
+def schema_for_experiment(experiment):
+    """Response schema matching the JSON format an experiment's template asks for"""
+    return EXPERIMENT_SCHEMAS.get(experiment, RESPONSE_SCHEMA)
+
+
+def packed_schema(target_names):
+    """Schema of a packed response: one RESPONSE_SCHEMA entry per target name"""
+    return {
+        "type": "object",
+        "properties": {
+            "targets": {
+                "type": "object",
+                "properties": {name: RESPONSE_SCHEMA for name in target_names},
+                "required": list(target_names),
+                "additionalProperties": False
+            }
+        },
+        "required": ["targets"],
+        "additionalProperties": False
+    }
+
+
+def response_format(schema, name="crypto_misuse_report"):
+    """OpenAI response_format for strict structured output against a schema"""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+class StreamingJSONParser:
+    """
+    Incremental, tolerant parser for one JSON object arriving in chunks.
+    Text before the first '{' (e.g. a ```json fence) and after the object is ignored.
+    value() closes open strings and containers, falling back to the last complete member.
+    verdict becomes "vuln" or "safe" as soon as the top-level "misuses" array is known
+    to be non-empty or empty.
+    """
+
+    CLOSERS = {"{": "}", "[": "]"}
+
+    def __init__(self):
+        self.text = []
+        self.stack = []          # [opener, current key, number of values]
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.string_is_key = False
+        self.escape = False
+        self.in_literal = False
+        self.expect_key = False
+        self.current = []
+        self.cut = None          # (length, closers) of the last prefix that closes cleanly
+        self.verdict = None
+
+    def _closers(self):
+        return "".join(self.CLOSERS[frame[0]] for frame in reversed(self.stack))
+
+    def _mark_cut(self, length=None):
+        self.cut = (len(self.text) if length is None else length, self._closers())
+
+    def _in_misuses(self):
+        return len(self.stack) == 2 and self.stack[0][1] == "misuses" and self.stack[1][0] == "["
+
+    def _value_started(self):
+        frame = self.stack[-1]
+        if frame[0] == "[":
+            frame[2] += 1
+            if self._in_misuses() and self.verdict is None:
+                self.verdict = "vuln"
+
+    def feed(self, chunk):
+        for ch in chunk:
+            if self.done:
+                break
+            if not self.started:
+                if ch != "{":
+                    continue
+                self.started = True
+
+            self.text.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    self.current.append(ch)
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.string_is_key:
+                        self.stack[-1][1] = "".join(self.current)
+                    else:
+                        self._mark_cut()
+                else:
+                    self.current.append(ch)
+                continue
+
+            if ch in '"{}[],:':
+                self.in_literal = False
+            if ch == '"':
+                self.in_string = True
+                self.current = []
+                self.string_is_key = self.stack[-1][0] == "{" and self.expect_key
+                if not self.string_is_key:
+                    self._value_started()
+            elif ch in "{[":
+                if self.stack:
+                    self._value_started()
+                self.stack.append([ch, None, 0])
+                self.expect_key = ch == "{"
+                self._mark_cut()
+            elif ch in "}]":
+                if self._in_misuses() and self.stack[-1][2] == 0 and self.verdict is None:
+                    self.verdict = "safe"
+                self.stack.pop()
+                self.expect_key = False
+                self.done = not self.stack
+                self._mark_cut()
+            elif ch == ",":
+                self._mark_cut(len(self.text) - 1)
+                self.expect_key = self.stack[-1][0] == "{"
+            elif ch == ":":
+                self.expect_key = False
+            elif not ch.isspace() and not self.in_literal:
+                self.in_literal = True
+                self._value_started()
+        return self.verdict
+
+    def value(self):
+        """Best-effort parse of the text received so far, or None"""
+        text = "".join(self.text)
+        if not text:
+            return None
+        candidates = [text]
+        if not self.done:
+            tail = text[:-1] if self.escape else text
+            if not (self.in_string and self.string_is_key):
+                candidates = [tail + ('"' if self.in_string else "") + self._closers()]
+            else:
+                candidates = []
+            if self.cut:
+                candidates.append(text[:self.cut[0]] + self.cut[1])
+        # Trailing commas are a common model slip
+        candidates += [re.sub(r",\s*([}\]])", r"\1", c) for c in list(candidates)]
+
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+        return None
+
+
+def parse_tolerant(text):
+    """Parse the first JSON object in text, repairing truncation and trailing commas"""
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    return parser.value()
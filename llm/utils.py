@@ -1,11 +1,32 @@
 import json
 import os
 
+# (loader, path, mtime) -> loaded content, so long-running processes read rules/templates once
+_file_cache = {}
+
+def _cached(path, loader):
+    """Return loader(path), reusing the previous result while the file is unchanged"""
+    key = (loader, os.path.abspath(path), os.path.getmtime(path))
+    if key not in _file_cache:
+        _file_cache[key] = loader(path)
+    return _file_cache[key]
+
+def _read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _read_rules(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.dumps(json.load(f), indent=2)
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def load_template(template_path):
     """Load prompt template file"""
     try:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return _cached(template_path, _read_text)
     except Exception as e:
         print(f"[!] Failed to load template: {str(e)}")
         return ""
@@ -13,12 +34,19 @@ def load_template(template_path):
 def load_rules(rules_path):
     """Load cryptographic usage rules"""
     try:
-        with open(rules_path, 'r', encoding='utf-8') as f:
-            return json.dumps(json.load(f), indent=2)
+        return _cached(rules_path, _read_rules)
     except Exception as e:
         print(f"[!] Failed to load rules: {str(e)}")
         return "[]"
 
+def load_rule_list(rules_path):
+    """Load cryptographic usage rules as a list of rule dicts"""
+    try:
+        return _cached(rules_path, _read_json)
+    except Exception as e:
+        print(f"[!] Failed to load rules: {str(e)}")
+        return []
+
 def load_json_file(file_path):
     """Load a JSON file"""
     try:
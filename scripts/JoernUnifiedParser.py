@@ -62,24 +62,21 @@ class JoernUnifiedParser:
         with open(path, "w") as f:
             json.dump(self.result, f, indent=2)
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 JoernUnifiedParser.py <target_name>")
-        sys.exit(1)
-
-    session_tag = os.environ.get("SESSION_TAG", "default")
-    base_dir = f"run_results/{session_tag}/outputs"
-    skipped_log_path = os.path.join(base_dir, "skipped_targets_joern.txt")
-
-    # Load filtered cryptographic class names
+def load_class_list():
+    """Load filtered cryptographic class names"""
     filtered_classes_path = os.path.join(SCRIPT_DIR, "..", "utils", "filtered_classes.txt")
 
     class_list = []
     if os.path.exists(filtered_classes_path):
         with open(filtered_classes_path, 'r') as f:
             class_list = [line.strip() for line in f if line.strip()]
+    return class_list
+
+def format_target(target_name, class_list, session_tag="default"):
+    """Format Joern logs of one target into formatted_result.json. Returns the output path or None if skipped."""
+    base_dir = f"run_results/{session_tag}/outputs"
+    skipped_log_path = os.path.join(base_dir, "skipped_targets_joern.txt")
 
-    target_name = sys.argv[1]
     joern_dir = os.path.join(base_dir, target_name, "joern")
     caller_log = os.path.join(joern_dir, "caller_callee_trace_output.txt")
     output_path = os.path.join(joern_dir, "formatted_result.json")
@@ -89,7 +86,7 @@ def main():
         print(f"[!] Skipping {target_name} (no crypto import found)")
         with open(skipped_log_path, "a") as skip_log:
             skip_log.write(f"{target_name}\n")
-        return
+        return None
 
     parser = JoernUnifiedParser()
 
@@ -105,6 +102,15 @@ def main():
     print(f"[+] Saving formatted result for {target_name}")
     parser.save_to_json(output_path)
     print(f"[✓] Saved at: {output_path}")
+    return output_path
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python3 JoernUnifiedParser.py <target_name>")
+        sys.exit(1)
+
+    session_tag = os.environ.get("SESSION_TAG", "default")
+    format_target(sys.argv[1], load_class_list(), session_tag)
 
 if __name__ == "__main__":
     main()
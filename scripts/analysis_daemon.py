@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pipeline import PROJECT_ROOT, AnalysisWorker, JoernServer
+from profiling import profile_mode
+
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "utils"))
+from process_filename import flat_name_for
+
+
+class AnalysisDaemon:
+    def __init__(self, worker, watch_dir=None, interval=2.0, workers=1):
+        self.worker = worker
+        self.watch_dir = os.path.abspath(watch_dir) if watch_dir else None
+        self.interval = interval
+        self.workers = workers
+        self.jobs = queue.Queue()
+        self.latest = {}
+        self.processed = 0
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._target_locks = {}
+
+    def target_lock(self, target_name):
+        """Lock held while a target is analysed; its outputs (and target/<name>.py) are shared by every run of it"""
+        with self._lock:
+            return self._target_locks.setdefault(target_name, threading.Lock())
+
+    def target_name_for(self, file_path):
+        """Same naming as utils/process_filename.py for a run over the watched directory"""
+        base = os.path.dirname(self.watch_dir) if self.watch_dir else os.path.dirname(os.path.dirname(file_path))
+        return os.path.splitext(flat_name_for(os.path.relpath(file_path, base)))[0]
+
+    def submit(self, file_path, reply=None):
+        file_path = os.path.abspath(file_path)
+        self.jobs.put((file_path, self.target_name_for(file_path), reply))
+
+    def work_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                file_path, target_name, reply = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Different targets run in parallel; a file changed again while it is analysed waits for that run
+            with self.target_lock(target_name):
+                print(f"[*] Analysing {file_path} as {target_name}")
+                if not os.path.exists(file_path):
+                    result = {"file": file_path, "target": target_name, "verdict": "error", "error": "File not found"}
+                else:
+                    result = self.worker.analyze(file_path, target_name)
+            with self._lock:
+                self.latest[file_path] = result
+                self.processed += 1
+            print(f"[✓] {target_name}: {result['verdict']} ({result.get('elapsed', 0)}s)")
+            if reply is not None:
+                reply.put(result)
+
+    def watch_loop(self):
+        snapshot = self._scan()
+        while not self.stop_event.wait(self.interval):
+            current = self._scan()
+            for path, stamp in current.items():
+                if snapshot.get(path) != stamp:
+                    self.submit(path)
+            snapshot = current
+
+    def _scan(self):
+        stamps = {}
+        for root, _, files in os.walk(self.watch_dir):
+            for name in files:
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    stamps[path] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def status(self):
+        return {
+            "session": self.worker.session_tag,
+            "uptime": round(time.time() - self.started, 1),
+            "processed": self.processed,
+            "queued": self.jobs.qsize(),
+            "workers": self.workers,
+            "watching": self.watch_dir,
+            "llm": self.worker.run_llm
+        }
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /status   daemon state
+    GET  /results  latest verdict per file
+    POST /analyze  {"files": [...]} → one JSON line per file as it completes, then {"done": true}
+    """
+    protocol_version = "HTTP/1.0"
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        daemon = self.server.analysis_daemon
+        if self.path == "/status":
+            self._send_json(daemon.status())
+        elif self.path == "/results":
+            with daemon._lock:
+                latest = dict(daemon.latest)
+            self._send_json(latest)
+        else:
+            self._send_json({"error": "Not found"}, 404)
+
+    def do_POST(self):
+        daemon = self.server.analysis_daemon
+        if self.path != "/analyze":
+            self._send_json({"error": "Not found"}, 404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            files = json.loads(self.rfile.read(length) or b"{}").get("files", [])
+        except (ValueError, AttributeError):
+            self._send_json({"error": "Expected JSON body {\"files\": [...]}"}, 400)
+            return
+
+        reply = queue.Queue()
+        for file_path in files:
+            daemon.submit(file_path, reply)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for _ in files:
+            self.wfile.write((json.dumps(reply.get()) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write((json.dumps({"done": True, "files": len(files)}) + "\n").encode("utf-8"))
+
+    def address_string(self):
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running CRYPTBARA analysis daemon")
+    parser.add_argument("--session", default=f"daemon_{datetime.now().strftime('%Y%m%d_%H%M%S')}", help="Session tag for outputs")
+    parser.add_argument("--watch", help="Source directory to watch for changed .py files")
+    parser.add_argument("--interval", type=float, default=2.0, help="Watch polling interval in seconds")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP API host")
+    parser.add_argument("--port", type=int, default=8731, help="HTTP API port (0 to disable)")
+    parser.add_argument("--socket", help="Unix socket path for the API")
+    parser.add_argument("--joern-port", type=int, default=8080, help="Port for the warm Joern server")
+    parser.add_argument("--no-joern-server", action="store_true", help="Run Joern per file instead of keeping a server warm")
+    parser.add_argument("--cascade", help="Cascade configuration JSON for the LLM stage")
+    parser.add_argument("--static-only", action="store_true", help="Skip the LLM stage")
+    parser.add_argument("--cpg-store", help="Persistent CPG store directory; unchanged files are not re-imported")
+    parser.add_argument("--workers", type=int, default=1, help="Files analysed in parallel (default: 1)")
+    args = parser.parse_args()
+
+    workers = max(args.workers, 1)
+    if workers > 1 and profile_mode():
+        # tracemalloc and the stage profiles are process-wide
+        print("[!] Profiling is enabled; analysing one file at a time")
+        workers = 1
+
+    os.chdir(PROJECT_ROOT)
+    os.environ["SESSION_TAG"] = args.session
+
+    joern_server = None
+    if not args.no_joern_server:
+        joern_server = JoernServer(port=args.joern_port)
+        joern_server.start()
+
+    cpg_store = None
+    if args.cpg_store:
+        from cpg_store import CPGStore
+        cpg_store = CPGStore(args.cpg_store)
+
+    worker = AnalysisWorker(args.session, joern_server, args.cascade, run_llm=not args.static_only, cpg_store=cpg_store)
+    daemon = AnalysisDaemon(worker, args.watch, args.interval, workers)
+
+    threads = [threading.Thread(target=daemon.work_loop, daemon=True) for _ in range(workers)]
+    if args.watch:
+        threads.append(threading.Thread(target=daemon.watch_loop, daemon=True))
+
+    servers = []
+    if args.port:
+        servers.append(ThreadingHTTPServer((args.host, args.port), DaemonRequestHandler))
+        print(f"[*] API listening on http://{args.host}:{args.port}")
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        servers.append(UnixHTTPServer(args.socket, DaemonRequestHandler))
+        print(f"[*] API listening on unix:{args.socket}")
+    for server in servers:
+        server.analysis_daemon = daemon
+        threads.append(threading.Thread(target=server.serve_forever, daemon=True))
+
+    def shutdown(signum, frame):
+        daemon.stop_event.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for thread in threads:
+        thread.start()
+    print(f"[✓] Daemon ready (session: {args.session}, workers: {workers}, watching: {args.watch or 'nothing'})")
+
+    while not daemon.stop_event.wait(1):
+        pass
+    print("\n[*] Shutting down...")
+    for server in servers:
+        server.shutdown()
+    if args.socket and os.path.exists(args.socket):
+        os.unlink(args.socket)
+    if joern_server:
+        joern_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -114,21 +114,13 @@ class ASTInterproceduralDependencyExtractor(ast.NodeVisitor):
         with open(path, "w") as f:
             json.dump(data, f, indent=2)
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: python3 ast_interflow.py <file_path> <target_name>")
-        sys.exit(1)
-    
-    file_path = sys.argv[1]
-    target_name = sys.argv[2]
-    
-    # Get session tag (from env or default)
-    session_tag = os.environ.get("SESSION_TAG", "default")
+def analyze_file(file_path, target_name, session_tag="default"):
+    """Extract interprocedural dependencies of one file. Returns the output path or None on failure."""
     output_dir = f"run_results/{session_tag}/outputs/{target_name}/ast"
     output_path = f"{output_dir}/interprocedural_dependencies.json"
-    
+
     os.makedirs(output_dir, exist_ok=True)
-    
+
     try:
         with open(file_path) as f:
             code = f.read()
@@ -136,12 +128,26 @@ def main():
         print(f"[!] Error: File not found: {file_path}")
         with open(output_path, "w") as f:
             json.dump({}, f)
-        sys.exit(1)
+        return None
 
     extractor = ASTInterproceduralDependencyExtractor()
     result = extractor.extract(code)
     extractor.save_to_json(result, output_path)
     print(f"[✓] AST analysis complete. Results saved to: {output_path}")
+    return output_path
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python3 ast_interflow.py <file_path> <target_name>")
+        sys.exit(1)
+    
+    file_path = sys.argv[1]
+    target_name = sys.argv[2]
+    
+    # Get session tag (from env or default)
+    session_tag = os.environ.get("SESSION_TAG", "default")
+    if analyze_file(file_path, target_name, session_tag) is None:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+
+DEFAULT_STORE_DIR = os.path.join(PROJECT_ROOT, "cpg_store")
+DEFAULT_MAX_MB = 10240
+
+VERSION_CACHE = "joern_version.json"
+
+_joern_version = None
+
+
+def joern_version(cache_dir=None):
+    """
+    Installed Joern version (override with $JOERN_VERSION); part of every store key.
+    `joern --version` starts a JVM, so the result is cached in <cache_dir>/joern_version.json,
+    keyed on the joern binary's path and mtime, and reused by later processes.
+    """
+    global _joern_version
+    if _joern_version is None:
+        _joern_version = os.environ.get("JOERN_VERSION")
+    if _joern_version is not None:
+        return _joern_version
+
+    binary = shutil.which("joern")
+    binary_key = None
+    if binary:
+        binary = os.path.realpath(binary)
+        binary_key = {"binary": binary, "mtime": os.path.getmtime(binary)}
+    cache_path = os.path.join(cache_dir, VERSION_CACHE) if cache_dir else None
+    if cache_path and binary_key and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if {k: cached.get(k) for k in binary_key} == binary_key and cached.get("version"):
+                _joern_version = cached["version"]
+                return _joern_version
+        except (OSError, ValueError):
+            pass
+
+    try:
+        output = subprocess.run(["joern", "--version"], capture_output=True, text=True, timeout=120).stdout
+        lines = [line.strip() for line in output.splitlines() if line.strip()]
+        _joern_version = lines[-1].split()[-1] if lines else "unknown"
+    except (OSError, subprocess.TimeoutExpired):
+        _joern_version = "unknown"
+
+    if cache_path and binary_key and _joern_version != "unknown":
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(binary_key, version=_joern_version), f)
+        os.replace(tmp_path, cache_path)
+    return _joern_version
+
+
+class CPGStore:
+    """
+    Content-addressed CPGs: <root>/<joern version>/<sha[:2]>/<sha256 of path and source>.bin.
+    A file's mtime is refreshed on every use; the least recently used CPGs are evicted
+    once the store exceeds max_bytes.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, max_mb=DEFAULT_MAX_MB):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source_path):
+        # A CPG records the path it was parsed from (file names, method fullNames), so an identical
+        # file at another path needs its own CPG
+        digest = hashlib.sha256(os.path.normpath(os.path.abspath(source_path)).encode("utf-8") + b"\0")
+        with open(source_path, "rb") as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.root, joern_version(self.root), key[:2], f"{key}.bin")
+
+    def get(self, source_path):
+        """Path of the stored CPG for a source, building it with joern-parse on a miss"""
+        cpg_path = self.path_for(self.key(source_path))
+        if os.path.exists(cpg_path):
+            self.hits += 1
+            os.utime(cpg_path)
+            return cpg_path
+
+        self.misses += 1
+        os.makedirs(os.path.dirname(cpg_path), exist_ok=True)
+        # Build next to the final path and rename, so concurrent workers never see a partial CPG
+        tmp_path = f"{cpg_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            result = subprocess.run(
+                ["joern-parse", os.path.abspath(source_path), "--language", "pythonsrc", "--output", tmp_path],
+                cwd=PROJECT_ROOT, capture_output=True, text=True
+            )
+            if result.returncode != 0 or not os.path.exists(tmp_path):
+                raise RuntimeError(f"joern-parse failed for {source_path}: {result.stderr.strip()[-500:]}")
+            os.replace(tmp_path, cpg_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict(keep=cpg_path)
+        return cpg_path
+
+    def entries(self):
+        """[(mtime, size, path)] of every stored CPG, oldest first"""
+        entries = []
+        for path in glob.glob(os.path.join(self.root, "*", "*", "*.bin")):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """Remove least recently used CPGs until the store fits in max_bytes. Returns the number removed."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "root": self.root,
+            "cpgs": len(entries),
+            "size_mb": round(sum(size for _, size, _ in entries) / (1024 * 1024), 1),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "versions": sorted({os.path.basename(os.path.dirname(os.path.dirname(p))) for _, _, p in entries})
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent CPG store for re-running Joern queries without re-import")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    query_parser = subparsers.add_parser("query", help="Run query scripts on stored CPGs of a session's targets")
+    query_parser.add_argument("--session", required=True, help="Session tag whose outputs/<target>/joern/ is written")
+    query_parser.add_argument("--scripts", nargs="+", help="Query scripts in joern_scripts/ (default: all pipeline scripts)")
+    query_parser.add_argument("--data", default="target", help="Directory of flattened target sources (default: target)")
+
+    build_parser = subparsers.add_parser("build", help="Store CPGs for sources without running queries")
+    build_parser.add_argument("--data", default="target", help="Directory of flattened target sources (default: target)")
+
+    subparsers.add_parser("stats", help="Show store size and contents")
+    subparsers.add_parser("evict", help="Evict least recently used CPGs down to the size cap")
+
+    for sub in subparsers.choices.values():
+        sub.add_argument("--store", default=DEFAULT_STORE_DIR, help=f"Store directory (default: {DEFAULT_STORE_DIR})")
+        sub.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB, help=f"Size cap in MB (default: {DEFAULT_MAX_MB})")
+    args = parser.parse_args()
+
+    data = os.path.abspath(args.data) if args.command in ("query", "build") else None
+    os.chdir(PROJECT_ROOT)
+    store = CPGStore(args.store, args.max_mb)
+
+    if args.command == "stats":
+        for key, value in store.stats().items():
+            print(f"[+] {key}: {value}")
+        return
+    if args.command == "evict":
+        print(f"[✓] Evicted {store.evict()} CPG(s)")
+        return
+
+    files = sorted(glob.glob(os.path.join(data, "*.py")))
+    if not files:
+        print(f"[!] No .py files in {data}")
+        sys.exit(1)
+
+    if args.command == "build":
+        for index, file_path in enumerate(files, start=1):
+            try:
+                store.get(file_path)
+            except RuntimeError as e:
+                print(f"[!] {e}")
+            print(f"\r[*] {index}/{len(files)} stored", end="")
+        print(f"\n[✓] {store.misses} built, {store.hits} already stored")
+        return
+
+    from run_joern_script import SCRIPT_FILES, run_joern_scripts
+    os.environ["SESSION_TAG"] = args.session
+    scripts = args.scripts or SCRIPT_FILES
+    failed = 0
+    for index, file_path in enumerate(files, start=1):
+        target_name = os.path.splitext(os.path.basename(file_path))[0]
+        print(f"[*] [{index}/{len(files)}] {target_name}")
+        if not run_joern_scripts(file_path, target_name, args.session, cpg_store=store, script_files=scripts):
+            failed += 1
+    print(f"[✓] Ran {len(scripts)} script(s) on {len(files)} target(s): "
+          f"{store.hits} CPG(s) reused, {store.misses} built, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
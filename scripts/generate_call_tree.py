@@ -53,15 +53,10 @@ def build_call_chains(edges, start="main", path=None, visited=None, results=None
 
     return results
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 generate_call_tree.py <target_name>")
-        sys.exit(1)
-
-    target_name = sys.argv[1]
-
+def generate_call_chains(target_name, session_tag=None):
+    """Write function_call_chains.txt for a target. Returns the output path or None if the Joern log is missing."""
     # Session tag support (optional)
-    SESSION_TAG = os.environ.get("SESSION_TAG") or ""
+    SESSION_TAG = (os.environ.get("SESSION_TAG") or "") if session_tag is None else session_tag
     OUTPUT_BASE = f"run_results/{SESSION_TAG}/outputs" if SESSION_TAG else "outputs"
 
     log_file = f"{OUTPUT_BASE}/{target_name}/joern/caller_callee_trace_output.txt"
@@ -71,7 +66,7 @@ def main():
 
     if not os.path.exists(log_file):
         print(f"[!] Error: Log file not found at '{log_file}'")
-        sys.exit(1)
+        return None
 
     with open(log_file, "r") as f:
         log_text = f.read()
@@ -95,6 +90,15 @@ def main():
             out.write("No valid function call chains found.")
 
     print(f"[+] Function call chains for '{target_name}' saved to '{output_file}'")
+    return output_file
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python3 generate_call_tree.py <target_name>")
+        sys.exit(1)
+
+    if generate_call_chains(sys.argv[1]) is None:
+        sys.exit(1)
     return 0
 
 if __name__ == "__main__":
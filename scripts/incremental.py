@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+import argparse
+import ast
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from pathlib import PurePosixPath
+
+from pipeline import PROJECT_ROOT, SRC_DIR, AnalysisWorker
+
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "utils"))
+from process_filename import flat_name_for, load_file_map, unique_flat_name, write_file_map
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+
+def changed_files(repo, base, head):
+    """Return (changed_or_added, deleted) .py paths between two revisions"""
+    changed, deleted = set(), set()
+    for line in git(repo, "diff", "--name-status", "-M", base, head, "--", "*.py").splitlines():
+        fields = line.split("\t")
+        status = fields[0]
+        if status.startswith("D"):
+            deleted.add(fields[1])
+        elif status.startswith("R"):
+            deleted.add(fields[1])
+            changed.add(fields[2])
+        else:
+            changed.add(fields[-1])
+    return changed, deleted
+
+
+def read_tree(repo, rev):
+    """Return {path: source} for every .py file at a revision, without checking it out"""
+    archive = subprocess.run(["git", "-C", repo, "archive", "--format=tar", rev],
+                             check=True, capture_output=True).stdout
+    sources = {}
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        for member in tar.getmembers():
+            if member.isfile() and member.name.endswith(".py"):
+                sources[member.name] = tar.extractfile(member).read().decode("utf-8", errors="replace")
+    return sources
+
+
+def module_name(path):
+    """Dotted module name of a repository-relative path"""
+    parts = list(PurePosixPath(path).with_suffix("").parts)
+    if parts and parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def imported_modules(path, source):
+    """Absolute module names imported by a file (relative imports resolved)"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return set()
+    package = module_name(path).split(".")
+    if not path.endswith("__init__.py"):
+        package = package[:-1]
+
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - node.level + 1] if node.level > 1 else package
+                prefix = ".".join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ""
+            if prefix:
+                modules.add(prefix)
+            # `from pkg import mod` may import a submodule
+            modules.update(f"{prefix}.{alias.name}" if prefix else alias.name for alias in node.names)
+    return modules
+
+
+# Standard library modules never resolve to repository files (Python 3.10+; builtins only before)
+STDLIB_MODULES = frozenset(getattr(sys, "stdlib_module_names", sys.builtin_module_names))
+
+
+def source_roots(paths):
+    """
+    Directories imports are resolved from: the repository root, plus the directory holding each
+    top-level package (the first ancestor without __init__.py, e.g. src/ in a src layout)
+    """
+    roots = {PurePosixPath(".")}
+    for path in paths:
+        parent = PurePosixPath(path).parent
+        if (parent / "__init__.py").as_posix() not in paths:
+            continue
+        while (parent.parent / "__init__.py").as_posix() in paths:
+            parent = parent.parent
+        roots.add(parent.parent)
+    return roots
+
+
+def dependents(sources, changed, max_depth=None):
+    """
+    Files that (transitively) import any changed file. Only import edges are followed; imports are
+    resolved under the source roots and the importing file's own directory (scripts import their
+    siblings), and standard library imports are ignored.
+    """
+    paths = set(sources)
+    roots = source_roots(paths)
+    by_module = defaultdict(set)
+    for path in sources:
+        for root in roots:
+            if root == PurePosixPath(".") or root in PurePosixPath(path).parents:
+                by_module[module_name(PurePosixPath(path).relative_to(root).as_posix())].add(path)
+
+    importers = defaultdict(set)
+    for path, source in sources.items():
+        directory = ".".join(PurePosixPath(path).parent.parts)
+        for module in imported_modules(path, source):
+            if module.split(".")[0] in STDLIB_MODULES:
+                continue
+            candidates = by_module.get(module, set()) | (by_module.get(f"{directory}.{module}", set()) if directory else set())
+            for target in candidates:
+                if target != path:
+                    importers[target].add(path)
+
+    affected = set(changed)
+    frontier = set(changed)
+    depth = 0
+    while frontier and (max_depth is None or depth < max_depth):
+        frontier = {imp for path in frontier for imp in importers[path]} - affected
+        affected |= frontier
+        depth += 1
+    return affected - set(changed)
+
+
+def target_names(paths, file_map, root):
+    """
+    {path: target name}. Paths in the baseline's file map keep their recorded name; other paths are
+    named as flatten_py_files would for <root>/<path>, without reusing a recorded name.
+    """
+    names = {path: file_map[path] for path in paths if path in file_map}
+    taken = {name + ".py" for name in file_map.values()}
+    for path in sorted(set(paths) - set(names)):
+        flat_name = unique_flat_name(PurePosixPath(root, path), taken)
+        taken.add(flat_name)
+        names[path] = os.path.splitext(flat_name)[0]
+    return names
+
+
+def guess_target_names(repo, base, paths, data, baseline_dir):
+    """
+    {path: target name} for a baseline without a file map, from flat_name_for under --data=<data>.
+    Exits if the names are ambiguous or a file that existed at base does not match a baseline target,
+    since collision suffixes cannot be reproduced reliably.
+    """
+    names = {path: os.path.splitext(flat_name_for(PurePosixPath(data, path)))[0] for path in paths}
+    by_name = defaultdict(list)
+    for path, name in names.items():
+        by_name[name].append(path)
+    ambiguous = sorted(path for group in by_name.values() if len(group) > 1 for path in group)
+
+    from dedup import load_clusters
+    baseline_outputs = os.path.join(baseline_dir, "outputs")
+    known = set(load_clusters(os.path.join(baseline_outputs, "clusters.json")))
+    if os.path.isdir(baseline_outputs):
+        known.update(os.listdir(baseline_outputs))
+    at_base = set(git(repo, "ls-tree", "-r", "--name-only", base).splitlines())
+    unresolved = sorted(path for path in paths if path in at_base and names[path] not in known)
+
+    if ambiguous or unresolved:
+        for label, group in (("ambiguous target name", ambiguous), ("no baseline target", unresolved)):
+            for path in group[:10]:
+                print(f"[!] {label}: {path} → {names[path]}")
+            if len(group) > 10:
+                print(f"[!] ... and {len(group) - 10} more")
+        print("[!] Cannot map files to the baseline's targets; check --data-prefix or rescan the baseline")
+        sys.exit(1)
+    return names
+
+
+def write_delta(baseline_verdicts, current_verdicts, out_path):
+    """Write new/fixed misuses between the baseline and the current session"""
+    rows = []
+    for target in sorted(set(baseline_verdicts) | set(current_verdicts)):
+        before = baseline_verdicts.get(target, "absent")
+        after = current_verdicts.get(target, "absent")
+        if after == "misuse" and before != "misuse":
+            rows.append([target, before, after, "new"])
+        elif before == "misuse" and after != "misuse":
+            rows.append([target, before, after, "fixed"])
+    with open(out_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["target", "baseline", "current", "change"])
+        writer.writerows(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse only what changed between two git revisions")
+    parser.add_argument("--repo", required=True, help="Path to the git repository")
+    parser.add_argument("--base", required=True, help="Base revision (the baseline session's state)")
+    parser.add_argument("--head", default="HEAD", help="Head revision (default: HEAD)")
+    parser.add_argument("--baseline", required=True, help="Session tag of the baseline scan")
+    parser.add_argument("--session", default=datetime.now().strftime("%Y%m%d_%H%M%S"), help="Session tag for this scan")
+    parser.add_argument("--data-prefix", help="Path given as --data= for the baseline scan; required if the baseline "
+                                              "has no file map (sessions scanned before it was recorded)")
+    parser.add_argument("--depth", type=int, help="Maximum import depth for dependents (default: unlimited)")
+    parser.add_argument("--cascade", help="Cascade configuration JSON for the LLM stage")
+    parser.add_argument("--static-only", action="store_true", help="Skip the LLM stage")
+    args = parser.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    os.chdir(PROJECT_ROOT)
+    os.environ["SESSION_TAG"] = args.session
+
+    baseline_dir = os.path.join("run_results", args.baseline)
+    session_dir = os.path.join("run_results", args.session)
+    if not os.path.isdir(baseline_dir):
+        print(f"[!] Baseline session not found: {baseline_dir}")
+        sys.exit(1)
+
+    changed, deleted = changed_files(repo, args.base, args.head)
+    sources = read_tree(repo, args.head)
+    changed &= set(sources)
+    dependent = dependents(sources, changed, args.depth)
+
+    # Reuse the baseline's names: the flattened name depends on its --data path and on collision order
+    recorded = load_file_map(args.baseline)
+    if recorded is not None:
+        data, file_map = recorded
+        data = args.data_prefix or data
+        # A baseline scanned from a subdirectory of this repository recorded paths relative to it
+        offset = os.path.relpath(os.path.abspath(data), repo)
+        if offset != "." and not offset.startswith(".."):
+            file_map = {PurePosixPath(offset, path).as_posix(): target for path, target in file_map.items()}
+            data = repo
+        names = target_names(sources, file_map, data)
+    elif args.data_prefix:
+        data = args.data_prefix
+        names = guess_target_names(repo, args.base, sources, data, baseline_dir)
+    else:
+        print(f"[!] Baseline session {args.baseline} has no file map; pass --data-prefix=<its --data= path>")
+        sys.exit(1)
+    write_file_map({names[path]: path for path in sources}, data, args.session)
+    baseline_outputs = os.path.join(baseline_dir, "outputs")
+
+    # Files not covered by the baseline are analysed as well
+    unknown = {path for path in sources
+               if not os.path.isdir(os.path.join(baseline_outputs, names[path]))} - changed - dependent
+    to_analyse = sorted(changed | dependent | unknown)
+    carried = sorted(path for path in sources if path not in to_analyse)
+
+    print(f"[*] {args.base}..{args.head}: {len(changed)} changed, {len(deleted)} deleted, "
+          f"{len(dependent)} dependents, {len(unknown)} not in baseline")
+    print(f"[*] Analysing {len(to_analyse)} file(s), carrying forward {len(carried)} from {args.baseline}")
+
+    # Carry forward unaffected results
+    for path in carried:
+        target = names[path]
+        for sub in ("outputs", "outputs_llm"):
+            src = os.path.join(baseline_dir, sub, target)
+            if os.path.isdir(src):
+                shutil.copytree(src, os.path.join(session_dir, sub, target), dirs_exist_ok=True)
+
+    # Analyse affected files
+    worker = AnalysisWorker(args.session, cascade_path=args.cascade, run_llm=not args.static_only)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index, path in enumerate(to_analyse, start=1):
+            file_path = os.path.join(tmp_dir, names[path] + ".py")
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(sources[path])
+            print(f"\n[*] [{index}/{len(to_analyse)}] {path} → {names[path]}")
+            result = worker.analyze(file_path, names[path])
+            print(f"[✓] {names[path]}: {result['verdict']} ({result['elapsed']}s)")
+
+    from result import collect_verdicts, summarize
+    summarize(args.session)
+
+    delta_path = f"results_{args.session}_delta.csv"
+    rows = write_delta(collect_verdicts(args.baseline), collect_verdicts(args.session), delta_path)
+    with open(os.path.join(session_dir, "incremental.json"), "w") as f:
+        json.dump({
+            "repo": repo, "base": args.base, "head": args.head, "baseline": args.baseline,
+            "changed": sorted(changed), "deleted": sorted(deleted),
+            "dependents": sorted(dependent), "not_in_baseline": sorted(unknown),
+            "analysed": [names[p] for p in to_analyse], "carried_forward": [names[p] for p in carried]
+        }, f, indent=2)
+
+    new = sum(1 for row in rows if row[3] == "new")
+    print(f"[✓] Delta: {new} new, {len(rows) - new} fixed misuse(s) → {delta_path}")
+
+
+if __name__ == "__main__":
+    main()
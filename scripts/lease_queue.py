@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from pipeline import PROJECT_ROOT, SRC_DIR, AnalysisWorker, has_merged_results
+
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "utils"))
+
+DEFAULT_LEASE_TTL = 600  # seconds without a heartbeat before a lease is reclaimed
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class LeaseQueue:
+    """
+    Target queue on a shared filesystem, under run_results/<session>/queue/:
+      sources/<target>.py   target sources (readable from every host)
+      leases/<target>.lease held by one worker; mtime is refreshed as a heartbeat
+      work/<worker>/        staging outputs of the targets a worker is analysing
+      done/<target>.json    result of a finished target
+      failed/<target>.json  attempt count and last error
+    A lease is written to a private file and hard-linked into place, which is atomic (fails if
+    the lease exists) on local filesystems and NFSv3+. Each lease carries a unique token; a worker
+    owns a target only while the lease file still holds its token.
+    """
+
+    def __init__(self, session_tag, lease_ttl=DEFAULT_LEASE_TTL, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.session_tag = session_tag
+        self.root = os.path.join("run_results", session_tag, "queue")
+        self.sources = os.path.join(self.root, "sources")
+        self.leases = os.path.join(self.root, "leases")
+        self.done = os.path.join(self.root, "done")
+        self.failed = os.path.join(self.root, "failed")
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.staging_tag = f"{session_tag}/queue/work/{self.worker_id.replace(':', '_')}"
+        self._tokens = {}  # target -> token of the lease this worker created
+
+    def init(self, files):
+        for path in (self.sources, self.leases, self.done, self.failed):
+            os.makedirs(path, exist_ok=True)
+        for file_path in files:
+            shutil.copy(file_path, os.path.join(self.sources, os.path.basename(file_path)))
+        print(f"[✓] Queued {len(files)} targets in {self.root}")
+
+    def targets(self):
+        return sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(self.sources, "*.py")))
+
+    def _lease_path(self, target):
+        return os.path.join(self.leases, f"{target}.lease")
+
+    def _private_path(self, target):
+        return f"{self._lease_path(target)}.{uuid.uuid4().hex}.tmp"
+
+    def is_done(self, target):
+        return os.path.exists(os.path.join(self.done, f"{target}.json"))
+
+    def attempts(self, target):
+        path = os.path.join(self.failed, f"{target}.json")
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r") as f:
+            return json.load(f).get("attempts", 0)
+
+    def is_exhausted(self, target):
+        return self.attempts(target) >= self.max_attempts
+
+    def _read_token(self, path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f).get("token")
+        except (OSError, ValueError):
+            return None
+
+    def _try_create_lease(self, target):
+        token = uuid.uuid4().hex
+        private_path = self._private_path(target)
+        with open(private_path, "w") as f:
+            json.dump({"worker": self.worker_id, "token": token, "claimed_at": time.time()}, f)
+        try:
+            # The complete lease appears atomically, and only if no lease exists
+            os.link(private_path, self._lease_path(target))
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(private_path)
+        self._tokens[target] = token
+        return True
+
+    def _reclaim_if_expired(self, target):
+        """Remove a lease whose holder stopped heartbeating. Returns True if it was removed."""
+        lease_path = self._lease_path(target)
+        try:
+            observed = os.stat(lease_path)
+        except FileNotFoundError:
+            return True
+        if time.time() - observed.st_mtime < self.lease_ttl:
+            return False
+
+        # Only one worker can rename a given lease away
+        stale_path = self._private_path(target)
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return False
+        taken = os.stat(stale_path)
+        if (taken.st_ino, taken.st_mtime) != (observed.st_ino, observed.st_mtime):
+            # A fresh lease replaced the stale one in between; put it back. If yet another worker
+            # leased the target meanwhile, the displaced holder sees it lost ownership and discards its work.
+            try:
+                os.link(stale_path, lease_path)
+            except FileExistsError:
+                pass
+            os.remove(stale_path)
+            return False
+        os.remove(stale_path)
+        print(f"[!] Reclaimed expired lease for {target}")
+        return True
+
+    def claim(self):
+        """Lease the next unfinished target, or return None if nothing is claimable right now"""
+        for target in self.targets():
+            if self.is_done(target) or self.is_exhausted(target):
+                continue
+            if self._try_create_lease(target) or (self._reclaim_if_expired(target) and self._try_create_lease(target)):
+                # It may have finished between the check and the claim
+                if self.is_done(target):
+                    self.release(target)
+                    continue
+                return target
+        return None
+
+    def owns(self, target):
+        token = self._tokens.get(target)
+        return token is not None and self._read_token(self._lease_path(target)) == token
+
+    def heartbeat(self, target):
+        """Refresh the lease; False once it has been reclaimed by another worker"""
+        if not self.owns(target):
+            return False
+        try:
+            os.utime(self._lease_path(target))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, target):
+        token = self._tokens.pop(target, None)
+        if token is None:
+            return
+        # Move the lease aside before checking it, so a lease that replaced ours is never removed
+        private_path = self._private_path(target)
+        try:
+            os.rename(self._lease_path(target), private_path)
+        except FileNotFoundError:
+            return
+        if self._read_token(private_path) != token:
+            try:
+                os.link(private_path, self._lease_path(target))
+            except FileExistsError:
+                pass
+        os.remove(private_path)
+
+    def staging_path(self, kind, target):
+        return os.path.join("run_results", self.staging_tag, kind, target)
+
+    def publish(self, target):
+        """Move a target's staged outputs into the session if this worker still owns it. Returns success."""
+        if not self.owns(target):
+            return False
+        for kind in ("outputs", "outputs_llm"):
+            staged = self.staging_path(kind, target)
+            final = os.path.join("run_results", self.session_tag, kind, target)
+            shutil.rmtree(final, ignore_errors=True)
+            if os.path.isdir(staged):
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.rename(staged, final)
+        self._take_skip_logs(target, publish=True)
+        return True
+
+    def discard(self, target):
+        for kind in ("outputs", "outputs_llm"):
+            shutil.rmtree(self.staging_path(kind, target), ignore_errors=True)
+        self._take_skip_logs(target, publish=False)
+
+    def _take_skip_logs(self, target, publish):
+        """Remove a target's lines from the staged skipped_targets*.txt logs, appending them to the session's"""
+        staged_dir = os.path.join("run_results", self.staging_tag, "outputs")
+        for staged_log in glob.glob(os.path.join(staged_dir, "skipped_targets*.txt")):
+            with open(staged_log, "r") as f:
+                lines = f.read().splitlines()
+            mine = [line for line in lines if line.strip() == target]
+            if not mine:
+                continue
+            if publish:
+                final_dir = os.path.join("run_results", self.session_tag, "outputs")
+                os.makedirs(final_dir, exist_ok=True)
+                # One append per log, so lines of concurrent workers do not interleave
+                with open(os.path.join(final_dir, os.path.basename(staged_log)), "a") as f:
+                    f.write("".join(f"{line}\n" for line in mine))
+            rest = [line for line in lines if line.strip() != target]
+            with open(staged_log, "w") as f:
+                f.write("".join(f"{line}\n" for line in rest))
+
+    def complete(self, target, result):
+        _write_json_atomic(os.path.join(self.done, f"{target}.json"), dict(result, worker=self.worker_id))
+        self.release(target)
+
+    def fail(self, target, error):
+        if self.owns(target):
+            _write_json_atomic(os.path.join(self.failed, f"{target}.json"), {
+                "attempts": self.attempts(target) + 1,
+                "error": error,
+                "worker": self.worker_id
+            })
+        self.release(target)
+
+    def pending(self):
+        """Targets that are neither done nor permanently failed"""
+        return [t for t in self.targets() if not self.is_done(t) and not self.is_exhausted(t)]
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _heartbeat_loop(lease_queue, target, stop_event, lost_event):
+    while not stop_event.wait(max(lease_queue.lease_ttl / 3, 1)):
+        if not lease_queue.heartbeat(target):
+            lost_event.set()
+            return
+
+
+def run_worker(lease_queue, worker, poll_interval=5.0):
+    """Claim and analyse targets until every target is done or permanently failed"""
+    processed = 0
+    print(f"[*] Worker {lease_queue.worker_id} started")
+    while True:
+        target = lease_queue.claim()
+        if target is None:
+            if not lease_queue.pending():
+                break
+            # Remaining targets are leased by other workers; wait for them to finish or expire
+            time.sleep(poll_interval)
+            continue
+
+        print(f"[*] {lease_queue.worker_id} → {target}")
+        stop_event, lost_event = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat_loop, args=(lease_queue, target, stop_event, lost_event),
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            # Analyse into this worker's staging area; only the lease holder publishes into the session
+            result = worker.analyze(os.path.join(lease_queue.sources, f"{target}.py"), target, lease_queue.staging_tag)
+            stop_event.set()
+            heartbeat.join()
+            if lost_event.is_set() or not lease_queue.owns(target):
+                print(f"[!] Lease for {target} was reclaimed by another worker; discarding this result")
+                lease_queue.discard(target)
+                lease_queue.release(target)
+            elif result.get("verdict") == "error":
+                lease_queue.discard(target)
+                lease_queue.fail(target, result.get("error", "unknown error"))
+            elif lease_queue.publish(target):
+                lease_queue.complete(target, result)
+                processed += 1
+            else:
+                lease_queue.discard(target)
+                lease_queue.release(target)
+        except Exception as e:
+            print(f"[!] {target} failed: {str(e)}")
+            lease_queue.discard(target)
+            lease_queue.fail(target, str(e))
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+    print(f"[✓] Worker {lease_queue.worker_id} finished ({processed} targets)")
+    return processed
+
+
+def verify(lease_queue):
+    """Return {target: problem} for targets without a complete result"""
+    problems = {}
+    output_base = os.path.join("run_results", lease_queue.session_tag, "outputs")
+    llm_base = os.path.join("run_results", lease_queue.session_tag, "outputs_llm")
+    for target in lease_queue.targets():
+        done_path = os.path.join(lease_queue.done, f"{target}.json")
+        if not os.path.exists(done_path):
+            if lease_queue.is_exhausted(target):
+                problems[target] = f"failed after {lease_queue.attempts(target)} attempts"
+            else:
+                problems[target] = "not finished"
+            continue
+        with open(done_path, "r") as f:
+            verdict = json.load(f).get("verdict")
+        if verdict not in ("skipped", "static_only") and not has_merged_results(output_base, target):
+            problems[target] = "missing merged_results.json"
+        elif verdict not in ("skipped", "static_only") and \
+                not os.path.exists(os.path.join(llm_base, target, "C1", "final_decision.txt")):
+            problems[target] = "missing final_decision.txt"
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed execution over a shared-filesystem lease queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = subparsers.add_parser("init", help="Create the queue for a session")
+    init_parser.add_argument("--data", default="target_files", help="Source directory or single .py file")
+    init_parser.add_argument("--dedup", action="store_true", help="Queue one representative per duplicate cluster")
+
+    worker_parser = subparsers.add_parser("worker", help="Claim and analyse targets until the queue is drained")
+    worker_parser.add_argument("--lease-ttl", type=float, default=DEFAULT_LEASE_TTL, help="Lease expiry in seconds")
+    worker_parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Attempts per target")
+    worker_parser.add_argument("--poll-interval", type=float, default=5.0, help="Wait between claims when all work is leased")
+    worker_parser.add_argument("--cascade", help="Cascade configuration JSON for the LLM stage")
+    worker_parser.add_argument("--static-only", action="store_true", help="Skip the LLM stage")
+    worker_parser.add_argument("--cpg-store", help="CPG store directory (may be shared by all workers)")
+
+    final_parser = subparsers.add_parser("finalize", help="Verify completeness and write the summary")
+    final_parser.add_argument("--allow-partial", action="store_true", help="Write the summary even if targets are missing")
+
+    subparsers.add_parser("status", help="Show queue progress")
+
+    for sub in (init_parser, worker_parser, final_parser, subparsers.choices["status"]):
+        sub.add_argument("--session", required=True, help="Session tag (shared by all workers)")
+
+    args = parser.parse_args()
+    data = os.path.abspath(args.data) if args.command == "init" else None
+    os.chdir(PROJECT_ROOT)
+    os.environ["SESSION_TAG"] = args.session
+
+    if args.command == "init":
+        lease_queue = LeaseQueue(args.session)
+        if os.path.isfile(data):
+            files = [data]
+        elif os.path.isdir(data):
+            from process_filename import flatten_py_files, write_file_map
+            flat_dir = os.path.join(lease_queue.root, "flat")
+            shutil.rmtree(flat_dir, ignore_errors=True)
+            write_file_map(flatten_py_files(data, flat_dir), data, args.session)
+            files = sorted(glob.glob(os.path.join(flat_dir, "*.py")))
+            if args.dedup:
+                from dedup import DEFAULT_THRESHOLD, cluster_targets, write_clusters
+                num_targets = len(files)
+                clusters, files = cluster_targets(files, DEFAULT_THRESHOLD)
+                write_clusters(clusters, files, num_targets, DEFAULT_THRESHOLD, args.session)
+        else:
+            print(f"[!] Invalid path: {data}")
+            sys.exit(1)
+        lease_queue.init(files)
+
+    elif args.command == "worker":
+        lease_queue = LeaseQueue(args.session, args.lease_ttl, args.max_attempts)
+        if not os.path.isdir(lease_queue.sources):
+            print(f"[!] No queue for session {args.session}. Run 'init' first.")
+            sys.exit(1)
+        cpg_store = None
+        if args.cpg_store:
+            from cpg_store import CPGStore
+            cpg_store = CPGStore(args.cpg_store)
+        worker = AnalysisWorker(args.session, cascade_path=args.cascade, run_llm=not args.static_only, cpg_store=cpg_store)
+        run_worker(lease_queue, worker, args.poll_interval)
+
+    elif args.command == "status":
+        lease_queue = LeaseQueue(args.session)
+        targets = lease_queue.targets()
+        done = sum(1 for t in targets if lease_queue.is_done(t))
+        leased = len(glob.glob(os.path.join(lease_queue.leases, "*.lease")))
+        failed = sum(1 for t in targets if lease_queue.is_exhausted(t))
+        print(f"[+] {done}/{len(targets)} done, {leased} leased, {failed} failed")
+
+    elif args.command == "finalize":
+        lease_queue = LeaseQueue(args.session)
+        problems = verify(lease_queue)
+        for target, problem in sorted(problems.items()):
+            print(f"[!] {target}: {problem}")
+        if problems and not args.allow_partial:
+            print(f"[✗] {len(problems)} incomplete target(s); summary not written")
+            sys.exit(1)
+        print(f"[✓] All {len(lease_queue.targets()) - len(problems)} targets complete")
+        from result import summarize
+        summarize(args.session)
+
+
+if __name__ == "__main__":
+    main()
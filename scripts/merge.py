@@ -35,8 +35,8 @@ def parse_receiver_trace(path):
 
 
 
-def merge_results(target_name):
-    SESSION_TAG = os.environ.get("SESSION_TAG", "")
+def merge_results(target_name, session_tag=None):
+    SESSION_TAG = os.environ.get("SESSION_TAG", "") if session_tag is None else session_tag
     OUTPUT_BASE = f"run_results/{SESSION_TAG}/outputs" if SESSION_TAG else "outputs"
 
     formatted_path = f"{OUTPUT_BASE}/{target_name}/joern/formatted_result.json"
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "llm"))
+sys.path.append(os.path.join(PROJECT_ROOT, "utils"))
+
+from run_joern_script import JOERN_SCRIPT_DIR, SCRIPT_FILES, fix_joern_script, run_joern_scripts, save_joern_output, scala_string
+from JoernUnifiedParser import load_class_list, format_target
+from ast_interflow import analyze_file
+from merge import merge_results
+from generate_call_tree import generate_call_chains
+from result import read_final_decision
+from profiling import PROFILE_ENV, PROFILE_MODES, jvm_profile_options, profile_mode, profile_stage
+
+SRC_DIR = "target"
+
+
+class JoernServer:
+    """A long-running `joern --server` process queried over its HTTP API"""
+
+    def __init__(self, host="127.0.0.1", port=8080, startup_timeout=300):
+        self.host = host
+        self.port = port
+        self.url = f"http://{host}:{port}"
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.scripts = {}
+        # Queries run against the server's active project, so one file is imported and queried at a time
+        self.lock = threading.Lock()
+
+    def start(self):
+        print(f"[*] Starting Joern server on {self.url}...")
+        env = None
+        if profile_mode():
+            # One flight recording for the whole server, under profiles/joern_server/
+            env = dict(os.environ)
+            env["JAVA_OPTS"], jfr_path = jvm_profile_options("joern_server", "joern_server")
+            print(f"[*] JVM flight recording: {jfr_path}")
+        self.process = subprocess.Popen(
+            ["joern", "--server", "--server-host", self.host, "--server-port", str(self.port)],
+            cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env
+        )
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Joern server exited during startup")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    break
+            except OSError:
+                time.sleep(1)
+        else:
+            raise RuntimeError("Timed out waiting for the Joern server")
+
+        # Query scripts are read once and reused for every file
+        for script_file in SCRIPT_FILES:
+            with open(os.path.join(PROJECT_ROOT, JOERN_SCRIPT_DIR, script_file), "r") as f:
+                self.scripts[script_file] = fix_joern_script(f.read())
+        print("[✓] Joern server ready")
+
+    def query(self, query_text, timeout=600):
+        """Run a query and return its stdout"""
+        import requests
+
+        response = requests.post(f"{self.url}/query-sync", json={"query": query_text}, timeout=timeout)
+        if response.status_code == 404:
+            # Older servers only support the asynchronous API
+            uuid = requests.post(f"{self.url}/query", json={"query": query_text}, timeout=30).json()["uuid"]
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                result = requests.get(f"{self.url}/result/{uuid}", timeout=30).json()
+                if result.get("success"):
+                    return result.get("stdout", "")
+                time.sleep(0.2)
+            raise RuntimeError(f"Timed out waiting for Joern query {uuid}")
+        result = response.json()
+        if not result.get("success", True):
+            raise RuntimeError(result.get("stderr") or result.get("err") or "Joern query failed")
+        return result.get("stdout", "")
+
+    def run_scripts(self, file_path, target_name, session_tag, cpg_store=None):
+        """Import the file once (or load its stored CPG) and run every query script against the same CPG"""
+        output_dir = f"run_results/{session_tag}/outputs/{target_name}/joern"
+        os.makedirs(output_dir, exist_ok=True)
+        project = scala_string(f"daemon_{target_name}")
+
+        cpg_path = None
+        if cpg_store is not None:
+            try:
+                cpg_path = cpg_store.get(file_path)
+            except (OSError, RuntimeError) as e:
+                print(f"[!] CPG store unavailable, falling back to importCode: {str(e)}")
+        with self.lock:
+            if cpg_path:
+                self.query(f"importCpg({scala_string(cpg_path)}, {project})")
+            else:
+                self.query(f"importCode({scala_string(os.path.abspath(file_path))}, {project})")
+            try:
+                for script_file, script_content in self.scripts.items():
+                    output_file = os.path.join(output_dir, f"{os.path.splitext(script_file)[0]}_output.txt")
+                    try:
+                        save_joern_output(output_file, self.query(script_content))
+                    except Exception as e:
+                        save_joern_output(output_file, "", str(e))
+            finally:
+                self.query(f"delete({project})")
+        return True
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class AnalysisWorker:
+    """Runs the full per-file pipeline in-process with warm state"""
+
+    def __init__(self, session_tag, joern_server=None, cascade_path=None, run_llm=True, cpg_store=None):
+        self.session_tag = session_tag
+        self.joern_server = joern_server
+        self.cpg_store = cpg_store
+        self.cascade_path = cascade_path
+        self.class_list = load_class_list()
+        self.run_llm = run_llm and bool(os.environ.get("OPENAI_API_KEY"))
+        self._run_experiment = None
+        self._detector_cli = None
+
+        if self.run_llm:
+            # Rules/templates are cached and the LLM client is built once, on first use
+            from run_llm_experiments import run_experiment
+            from llm_detector import run_cli
+            self._run_experiment = run_experiment
+            self._detector_cli = run_cli
+
+    def _run_detector(self, cmd):
+        # cmd is ["python3", "llm/llm_detector.py", ...]
+        self._detector_cli(cmd[2:])
+
+    def analyze(self, file_path, target_name, session_tag=None):
+        """Analyse one file; session_tag redirects the outputs (e.g. to a lease queue's staging area)"""
+        session_tag = session_tag or self.session_tag
+        started = time.time()
+        result = {"file": file_path, "target": target_name}
+        output_base = f"run_results/{session_tag}/outputs"
+
+        # Drop outputs of a previous version of this file
+        shutil.rmtree(os.path.join(output_base, target_name), ignore_errors=True)
+        shutil.rmtree(f"run_results/{session_tag}/outputs_llm/{target_name}", ignore_errors=True)
+
+        os.makedirs(SRC_DIR, exist_ok=True)
+        target_path = os.path.join(SRC_DIR, f"{target_name}.py")
+        if os.path.abspath(file_path) != os.path.abspath(target_path):
+            shutil.copy(file_path, target_path)
+
+        try:
+            if self.joern_server:
+                self.joern_server.run_scripts(target_path, target_name, session_tag, self.cpg_store)
+            else:
+                run_joern_scripts(target_path, target_name, session_tag, self.cpg_store)
+            with profile_stage("JoernUnifiedParser", target_name, session_tag):
+                format_target(target_name, self.class_list, session_tag)
+            with profile_stage("ast_interflow", target_name, session_tag):
+                analyze_file(target_path, target_name, session_tag)
+            with profile_stage("merge", target_name, session_tag):
+                merge_results(target_name, session_tag)
+            with profile_stage("generate_call_tree", target_name, session_tag):
+                generate_call_chains(target_name, session_tag)
+        except Exception as e:
+            result.update({"verdict": "error", "error": f"Static analysis failed: {str(e)}"})
+            result["elapsed"] = round(time.time() - started, 3)
+            return result
+
+        if not has_merged_results(output_base, target_name):
+            result["verdict"] = "skipped"
+        elif not self.run_llm:
+            result["verdict"] = "static_only"
+        else:
+            self._run_experiment(target_name, "C1", session_tag, self.cascade_path, runner=self._run_detector)
+            result["verdict"] = read_final_decision(f"run_results/{session_tag}/outputs_llm/{target_name}/C1/final_decision.txt")
+
+        result["elapsed"] = round(time.time() - started, 3)
+        return result
+
+
+def has_merged_results(output_base, target_name):
+    """True if the static stages produced non-empty merged results (same check as run_llm.sh)"""
+    merged_file = os.path.join(output_base, target_name, "merged_results.json")
+    if not os.path.exists(merged_file):
+        return False
+    with open(merged_file, "r") as f:
+        return "".join(f.read().split()) not in ("", "{}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run static analysis, LLM detection and the summary in one process")
+    parser.add_argument("--data", default="target_files", help="Source directory or single .py file (default: target_files)")
+    parser.add_argument("--session", default=os.environ.get("SESSION_TAG") or datetime.now().strftime("%Y%m%d_%H%M%S"),
+                        help="Session tag (default: current timestamp)")
+    parser.add_argument("--dedup", action="store_true", help="Analyse one representative per duplicate cluster")
+    parser.add_argument("--cascade", help="Cascade configuration JSON for the LLM stage")
+    parser.add_argument("--static-only", action="store_true", help="Skip the LLM stage")
+    parser.add_argument("--joern-server", action="store_true", help="Keep one Joern server warm instead of a JVM per script")
+    parser.add_argument("--joern-port", type=int, default=8080, help="Port for the Joern server")
+    parser.add_argument("--cpg-store", help="Persistent CPG store directory; unchanged files are not re-imported")
+    parser.add_argument("--cpg-store-max-mb", type=float, help="Size cap of the CPG store in MB")
+    parser.add_argument("--profile", nargs="?", const="sample", choices=PROFILE_MODES,
+                        help="Write per-target profiles (sampled stacks, memory, Joern flight recordings) under profiles/")
+    parser.add_argument("--prioritize", action="store_true", help="Analyse targets in descending static risk score")
+    parser.add_argument("--max-wall-time", type=float, help="Stop starting new targets after this many seconds (implies --prioritize)")
+    parser.add_argument("--max-tokens", type=int, help="Stop starting new targets after this many LLM tokens (implies --prioritize)")
+    args = parser.parse_args()
+
+    data = os.path.abspath(args.data)
+    os.chdir(PROJECT_ROOT)
+    os.environ["SESSION_TAG"] = args.session
+    if args.profile:
+        os.environ[PROFILE_ENV] = args.profile
+    print(f"[*] Session Tag: {args.session}")
+
+    if os.path.isfile(data):
+        files = [data]
+    elif os.path.isdir(data):
+        from process_filename import flatten_py_files, write_file_map
+        for old in glob.glob(os.path.join(SRC_DIR, "*.py")):
+            os.remove(old)
+        write_file_map(flatten_py_files(data, SRC_DIR), data, args.session)
+        files = sorted(glob.glob(os.path.join(SRC_DIR, "*.py")))
+        if args.dedup:
+            from dedup import DEFAULT_THRESHOLD, cluster_targets, write_clusters
+            clusters, files = cluster_targets(files, DEFAULT_THRESHOLD)
+            write_clusters(clusters, files, len(glob.glob(os.path.join(SRC_DIR, "*.py"))), DEFAULT_THRESHOLD, args.session)
+    else:
+        print(f"[!] Invalid path: {args.data}")
+        sys.exit(1)
+
+    joern_server = None
+    if args.joern_server:
+        joern_server = JoernServer(port=args.joern_port)
+        joern_server.start()
+
+    # Highest-risk targets first, so a budget cut leaves the most important ones analysed
+    ranked, budget, stopped = None, None, None
+    if args.prioritize or args.max_wall_time is not None or args.max_tokens is not None:
+        from scheduler import Budget, rank_targets, target_tokens, write_schedule
+        ranked = rank_targets(files, args.session)
+        files = [entry["file"] for entry in ranked]
+        budget = Budget(args.max_wall_time, args.max_tokens)
+        write_schedule(ranked, args.session, budget)
+
+    cpg_store = None
+    if args.cpg_store:
+        from cpg_store import DEFAULT_MAX_MB, CPGStore
+        cpg_store = CPGStore(args.cpg_store, args.cpg_store_max_mb or DEFAULT_MAX_MB)
+
+    try:
+        worker = AnalysisWorker(args.session, joern_server, args.cascade, run_llm=not args.static_only, cpg_store=cpg_store)
+        for index, file_path in enumerate(files, start=1):
+            target_name = os.path.splitext(os.path.basename(file_path))[0]
+            if budget:
+                stopped = budget.stop_reason()
+                if stopped:
+                    print(f"[!] Stopping: {stopped}")
+                    break
+            print(f"\n[*] [{index}/{len(files)}] Processing {target_name}...")
+            result = worker.analyze(file_path, target_name)
+            print(f"[✓] {target_name}: {result['verdict']} ({result['elapsed']}s)")
+            if budget:
+                budget.charge(target_tokens(args.session, target_name))
+                ranked[index - 1]["status"] = "skipped" if result["verdict"] == "skipped" else "done"
+                write_schedule(ranked, args.session, budget)
+    finally:
+        if joern_server:
+            joern_server.stop()
+
+    if ranked:
+        for entry in ranked:
+            if entry["status"] == "pending":
+                entry["status"] = "not_run"
+        write_schedule(ranked, args.session, budget, stopped)
+
+    if cpg_store:
+        print(f"[+] CPG store: {cpg_store.hits} reused, {cpg_store.misses} built")
+    if args.profile:
+        from profiling import merge_collapsed
+        print(f"[+] Profiles: {merge_collapsed(args.session)}")
+
+    from result import summarize
+    summarize(args.session)
+
+
+if __name__ == "__main__":
+    main()
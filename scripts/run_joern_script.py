@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 
+import argparse
+import json
 import sys
 import os
 import subprocess
 import tempfile
 
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "utils"))
+from profiling import jvm_profile_options, profile_mode
+
+JOERN_SCRIPT_DIR = "joern_scripts"
+SCRIPT_FILES = ["caller_callee_trace.sc", "receiver_trace.sc", "return.sc"]
+
 def fix_joern_script(content):
     """Patch Joern script to fix type-related errors (e.g., resolver type declaration)."""
     return content.replace(
@@ -12,12 +20,27 @@ def fix_joern_script(content):
         "implicit val resolver: io.joern.dataflowengineoss.language.ExtendedCfgNode => io.joern.dataflowengineoss.language.ExtendedCfgNode = io.joern.dataflowengineoss.language.toExtendedCfgNode"
     )
 
-def run_joern_script(script_content, target_file, output_file):
-    """Run a Joern script with importCode dynamically injected."""
+def scala_string(value):
+    """Quoted, escaped Scala string literal (JSON string escapes are valid in Scala)"""
+    return json.dumps(str(value), ensure_ascii=False)
+
+def save_joern_output(output_file, stdout, stderr=""):
+    """Write Joern stdout (and stderr, if any) to an output file."""
+    with open(output_file, 'w') as f:
+        f.write(stdout)
+        if stderr:
+            f.write("\n\n--- ERRORS ---\n")
+            f.write(stderr)
+
+def run_joern_script(script_content, target_file, output_file, cpg_path=None, target_name=None):
+    """Run a Joern script with importCode (or importCpg of a stored CPG) dynamically injected."""
     script_content = fix_joern_script(script_content)
 
-    # Dynamically insert importCode for the target file
-    import_statement = f'importCode("{os.path.abspath(target_file)}")\n'
+    # Dynamically insert the import for the target file
+    if cpg_path:
+        import_statement = f'importCpg({scala_string(os.path.abspath(cpg_path))})\n'
+    else:
+        import_statement = f'importCode({scala_string(os.path.abspath(target_file))})\n'
     full_script = import_statement + script_content
 
     with tempfile.NamedTemporaryFile(suffix=".sc", delete=False) as temp_file:
@@ -26,14 +49,16 @@ def run_joern_script(script_content, target_file, output_file):
 
     try:
         cmd = f'joern --script {temp_file_path}'
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-
-        with open(output_file, 'w') as f:
-            f.write(result.stdout)
-            if result.stderr:
-                f.write("\n\n--- ERRORS ---\n")
-                f.write(result.stderr)
-
+        env = None
+        if profile_mode():
+            # Java Flight Recorder for this Joern JVM
+            env = dict(os.environ)
+            env["JAVA_OPTS"], _ = jvm_profile_options(
+                target_name or os.path.splitext(os.path.basename(target_file))[0],
+                "joern_" + os.path.basename(output_file).replace("_output.txt", "")
+            )
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, env=env)
+        save_joern_output(output_file, result.stdout, result.stderr)
         return True
 
     except Exception as e:
@@ -45,24 +70,22 @@ def run_joern_script(script_content, target_file, output_file):
     finally:
         os.unlink(temp_file_path)
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 run_joern_script.py <file_path> <target_name> [session_tag]")
-        sys.exit(1)
-
-    file_path = sys.argv[1]
-    target_name = sys.argv[2]
-    session_tag = sys.argv[3] if len(sys.argv) > 3 else "default"
-
+def run_joern_scripts(file_path, target_name, session_tag="default", cpg_store=None, script_files=None):
+    """Run Joern query scripts (default: all) on one file. Returns True if every script ran."""
     output_dir = f"run_results/{session_tag}/outputs/{target_name}/joern"
     os.makedirs(output_dir, exist_ok=True)
 
-    script_dir = "joern_scripts"
-    script_files = ["caller_callee_trace.sc", "receiver_trace.sc", "return.sc"]
+    # Load the file's stored CPG instead of re-importing the source for every script
+    cpg_path = None
+    if cpg_store is not None:
+        try:
+            cpg_path = cpg_store.get(file_path)
+        except (OSError, RuntimeError) as e:
+            print(f"    × CPG store unavailable, falling back to importCode: {str(e)}")
 
     all_success = True
-    for script_file in script_files:
-        script_path = os.path.join(script_dir, script_file)
+    for script_file in script_files or SCRIPT_FILES:
+        script_path = os.path.join(JOERN_SCRIPT_DIR, script_file)
         output_file = os.path.join(output_dir, f"{os.path.splitext(script_file)[0]}_output.txt")
 
         print(f"    → Running {script_file} on {file_path}")
@@ -71,13 +94,31 @@ def main():
             with open(script_path, 'r') as f:
                 script_content = f.read()
 
-            success = run_joern_script(script_content, file_path, output_file)
+            success = run_joern_script(script_content, file_path, output_file, cpg_path, target_name)
             all_success = all_success and success
 
         except Exception as e:
             print(f"    × Error processing {script_file}: {str(e)}")
             all_success = False
 
+    return all_success
+
+def main():
+    parser = argparse.ArgumentParser(usage="python3 run_joern_script.py <file_path> <target_name> [session_tag] [--cpg-store DIR]")
+    parser.add_argument("file_path")
+    parser.add_argument("target_name")
+    parser.add_argument("session_tag", nargs="?", default="default")
+    parser.add_argument("--cpg-store", help="Persistent CPG store directory (reuse CPGs across runs)")
+    parser.add_argument("--cpg-store-max-mb", type=float, help="Size cap of the CPG store in MB")
+    parser.add_argument("--scripts", nargs="+", help=f"Query scripts in {JOERN_SCRIPT_DIR}/ (default: all)")
+    args = parser.parse_args()
+
+    cpg_store = None
+    if args.cpg_store:
+        from cpg_store import DEFAULT_MAX_MB, CPGStore
+        cpg_store = CPGStore(args.cpg_store, args.cpg_store_max_mb or DEFAULT_MAX_MB)
+
+    all_success = run_joern_scripts(args.file_path, args.target_name, args.session_tag, cpg_store, args.scripts)
     sys.exit(0 if all_success else 1)
 
 if __name__ == "__main__":
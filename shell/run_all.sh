@@ -23,8 +23,11 @@ AST_SCRIPT="scripts/ast_interflow.py"
 MERGE_SCRIPT="scripts/merge.py"
 TREE_SCRIPT="scripts/generate_call_tree.py"
 FLATTENER_SCRIPT="utils/process_filename.py"
+DEDUP_SCRIPT="utils/dedup.py"
 
 DATA="target_files"  # Default data source
+DEDUP=0
+PRIORITIZE=0
 
 # Parse CLI options (LLM-related flags are ignored)
 while [[ "$#" -gt 0 ]]; do
@@ -33,11 +36,16 @@ while [[ "$#" -gt 0 ]]; do
         --list=*) FILE_LIST="${1#*=}";;
         --output=*) OUTPUT_BASE="${1#*=}";;
         --data=*) DATA="${1#*=}";;
-        --target=*|--experiment=*|--session=*) 
+        --dedup) DEDUP=1;;
+        --prioritize) PRIORITIZE=1;;
+        --cpg-store=*) CPG_STORE="${1#*=}";;
+        --profile) export CRYPTBARA_PROFILE=sample;;
+        --profile=*) export CRYPTBARA_PROFILE="${1#*=}";;
+        --target=*|--experiment=*|--session=*|--cascade=*|--pack-budget=*|--max-wall-time=*|--max-tokens=*) 
             ;;  # Ignore LLM-specific options
         *) 
             echo "Unknown option: $1" | tee -a "$LOG_FILE"
-            echo "Valid options: --file=, --list=, --output=, --data=" | tee -a "$LOG_FILE"
+            echo "Valid options: --file=, --list=, --output=, --data=, --dedup, --prioritize, --cpg-store=, --profile[=sample|cprofile]" | tee -a "$LOG_FILE"
             exit 1
             ;;
     esac
@@ -50,11 +58,24 @@ if [[ -f "$DATA" ]]; then
 elif [[ -d "$DATA" ]]; then
     python3 "$FLATTENER_SCRIPT" "$DATA" >> "$LOG_FILE" 2>&1
     FILES=($TARGET_FLAT/*.py)
+
+    # Analyse one representative per duplicate cluster
+    if [[ "$DEDUP" -eq 1 ]]; then
+        echo "[+] Clustering duplicate targets..." | tee -a "$LOG_FILE"
+        python3 "$DEDUP_SCRIPT" "$TARGET_FLAT" --session="$SESSION_TAG" 2>&1 | tee -a "$LOG_FILE"
+        mapfile -t FILES < "run_results/${SESSION_TAG}/outputs/representatives.txt"
+    fi
 else
     echo "[!] Invalid path: $DATA" | tee -a "$LOG_FILE"
     exit 1
 fi
 
+# Order targets by static risk score (highest first)
+if [[ "$PRIORITIZE" -eq 1 ]]; then
+    echo "[+] Ranking targets by risk..." | tee -a "$LOG_FILE"
+    mapfile -t FILES < <(python3 utils/scheduler.py rank --session="$SESSION_TAG" "${FILES[@]}")
+fi
+
 echo "[+] Beginning analysis..." | tee -a "$LOG_FILE"
 
 # Progress bar
@@ -68,6 +89,16 @@ print_progress() {
     printf "\r[%-${width}s] %3d%% Completed" "${bar:0:progress}" "$percent"
 }
 
+# Python stages run under the profiler with --profile (Joern records a JFR via CRYPTBARA_PROFILE)
+run_stage() {
+    local target=$1; shift
+    if [[ -n "$CRYPTBARA_PROFILE" ]]; then
+        python3 utils/profiling.py exec --target "$target" "$@"
+    else
+        python3 "$@"
+    fi
+}
+
 # Process all target files
 total=${#FILES[@]}
 current=0
@@ -85,24 +116,28 @@ for file_path in "${FILES[@]}"; do
     echo -e "\n[*] Processing $target_name..." | tee -a "$LOG_FILE"
 
     echo "[→] Running Joern..." | tee -a "$LOG_FILE"
-    python3 "$JOERN_SCRIPT" "$file_path" "$target_name" "$SESSION_TAG" >> "$LOG_FILE" 2>&1
+    python3 "$JOERN_SCRIPT" "$file_path" "$target_name" "$SESSION_TAG" ${CPG_STORE:+--cpg-store "$CPG_STORE"} >> "$LOG_FILE" 2>&1
     echo "[✓] Joern completed"
 
     echo "[→] Formatting Joern result..."
-    python3 "$FORMATTER_SCRIPT" "$target_name" >> "$LOG_FILE" 2>&1
+    run_stage "$target_name" "$FORMATTER_SCRIPT" "$target_name" >> "$LOG_FILE" 2>&1
     echo "[✓] Formatting completed"
 
     echo "[→] Running AST interprocedural analysis..."
-    python3 "$AST_SCRIPT" "$file_path" "$target_name" >> "$LOG_FILE" 2>&1
+    run_stage "$target_name" "$AST_SCRIPT" "$file_path" "$target_name" >> "$LOG_FILE" 2>&1
     echo "[✓] AST analysis completed"
 
     echo "[→] Merging results..."
-    python3 "$MERGE_SCRIPT" "$target_name" >> "$LOG_FILE" 2>&1
+    run_stage "$target_name" "$MERGE_SCRIPT" "$target_name" >> "$LOG_FILE" 2>&1
     echo "[✓] Merging completed"
 
     echo "[→] Generating call chain..."
-    python3 "$TREE_SCRIPT" "$target_name" >> "$LOG_FILE" 2>&1
+    run_stage "$target_name" "$TREE_SCRIPT" "$target_name" >> "$LOG_FILE" 2>&1
     echo "[✓] Call chain generated"
 done
 
 echo -e "\n[✓] Static analysis completed at $(date)" | tee -a "$LOG_FILE"
+
+if [[ -n "$CRYPTBARA_PROFILE" ]]; then
+    python3 utils/profiling.py merge --session="$SESSION_TAG" | tee -a "$LOG_FILE"
+fi
@@ -9,6 +9,15 @@ while [[ "$#" -gt 0 ]]; do
         --target=*)      SINGLE_TARGET="${1#*=}";;
         --experiment=*)  EXPERIMENT_KEY="${1#*=}";;
         --session=*)     SESSION_TAG="${1#*=}";;
+        --cascade=*)     CASCADE="${1#*=}";;
+        --pack-budget=*) PACK_BUDGET="${1#*=}";;
+        --prioritize)    PRIORITIZE=1;;
+        --profile)       export CRYPTBARA_PROFILE=sample;;
+        --profile=*)     export CRYPTBARA_PROFILE="${1#*=}";;
+        --max-wall-time=*) MAX_WALL_TIME="${1#*=}"; PRIORITIZE=1;;
+        --max-tokens=*)  MAX_TOKENS="${1#*=}"; PRIORITIZE=1;;
+        --file=*|--list=*|--output=*|--data=*|--dedup|--cpg-store=*)
+            ;;  # Ignore static-analysis options
         *) echo "Unknown option: $1"; exit 1;;
     esac
     shift
@@ -46,6 +55,38 @@ if [ ! -f "$PROJECT_DIR/llm/rules/rules.json" ]; then
     echo "[!] Warning: rules.json is missing" | tee -a "$LOG_FILE"
 fi
 
+# Merge the session's profiles (with --profile) and log completion
+finish() {
+    if [[ -n "$CRYPTBARA_PROFILE" ]]; then
+        python3 "$PROJECT_DIR/utils/profiling.py" merge --session="$SESSION_TAG" | tee -a "$LOG_FILE"
+    fi
+    echo -e "\n[✓] All LLM experiments finished." | tee -a "$LOG_FILE"
+}
+
+# Packed mode: small targets share requests (llm/packing.py selects targets itself)
+if [[ -n "$PACK_BUDGET" ]]; then
+    cmd="PYTHONPATH=$PROJECT_DIR python3 $PROJECT_DIR/llm/packing.py --session \"$SESSION_TAG\" --budget \"$PACK_BUDGET\""
+    [[ -n "$CASCADE" ]] && cmd="$cmd --cascade \"$CASCADE\""
+    [[ -n "$SINGLE_TARGET" ]] && cmd="$cmd --target \"$SINGLE_TARGET\""
+    echo "[*] Running: $cmd" | tee -a "$LOG_FILE"
+    eval "$cmd" 2>&1 | tee -a "$LOG_FILE"
+    finish
+    exit 0
+fi
+
+# Prioritised mode: highest static risk first, stopping at the budgets (utils/scheduler.py selects targets itself)
+if [[ -n "$PRIORITIZE" ]]; then
+    cmd="PYTHONPATH=$PROJECT_DIR python3 $PROJECT_DIR/utils/scheduler.py run --session \"$SESSION_TAG\""
+    [[ -n "$MAX_WALL_TIME" ]] && cmd="$cmd --max-wall-time \"$MAX_WALL_TIME\""
+    [[ -n "$MAX_TOKENS" ]] && cmd="$cmd --max-tokens \"$MAX_TOKENS\""
+    [[ -n "$CASCADE" ]] && cmd="$cmd --cascade \"$CASCADE\""
+    [[ -n "$SINGLE_TARGET" ]] && cmd="$cmd --target \"$SINGLE_TARGET\""
+    echo "[*] Running: $cmd" | tee -a "$LOG_FILE"
+    eval "$cmd" 2>&1 | tee -a "$LOG_FILE"
+    finish
+    exit 0
+fi
+
 # Target selection
 if [[ -n "$SINGLE_TARGET" ]]; then
     targets=("${OUTPUT_BASE}/$SINGLE_TARGET/merged_results.json")
@@ -56,6 +97,7 @@ fi
 echo "[+] Starting LLM experiments for selected targets..." | tee -a "$LOG_FILE"
 echo "[+] Target files: ${#targets[@]}" | tee -a "$LOG_FILE"
 echo "[+] Experiment key: $EXPERIMENT_KEY" | tee -a "$LOG_FILE"
+echo "[+] Cascade: ${CASCADE:-default}" | tee -a "$LOG_FILE"
 echo "[+] API Key prefix: ${OPENAI_API_KEY:0:4}...${OPENAI_API_KEY: -4}" | tee -a "$LOG_FILE"
 
 total=${#targets[@]}
@@ -80,6 +122,9 @@ for merged_file in "${targets[@]}"; do
     fi
 
     cmd="PYTHONPATH=$PROJECT_DIR python3 $PROJECT_DIR/llm/run_llm_experiments.py \"$target_name\" \"$EXPERIMENT_KEY\" \"$SESSION_TAG\""
+    if [[ -n "$CASCADE" ]]; then
+        cmd="$cmd --cascade \"$CASCADE\""
+    fi
     echo "[*] Running: $cmd" | tee -a "$LOG_FILE"
 
     if eval "$cmd"; then
@@ -95,4 +140,4 @@ for merged_file in "${targets[@]}"; do
     fi
 done
 
-echo -e "\n[✓] All LLM experiments finished." | tee -a "$LOG_FILE"
+finish
@@ -0,0 +1,12 @@
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Stage modules are scripts that import their siblings by bare name
+for directory in ("llm", "utils", "scripts"):
+    path = os.path.join(PROJECT_ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from analysis_daemon import AnalysisDaemon
+
+
+class StubWorker:
+    """Records how many analyses overlap, overall and per target"""
+
+    session_tag = "test"
+    run_llm = False
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.max_total = 0
+        self.max_per_target = 0
+
+    def analyze(self, file_path, target_name):
+        with self.lock:
+            self.active[target_name] = self.active.get(target_name, 0) + 1
+            self.max_total = max(self.max_total, sum(self.active.values()))
+            self.max_per_target = max(self.max_per_target, self.active[target_name])
+        time.sleep(0.2)
+        with self.lock:
+            self.active[target_name] -= 1
+        return {"file": file_path, "target": target_name, "verdict": "static_only", "elapsed": 0.2}
+
+
+def test_workers_analyse_targets_in_parallel_but_never_the_same_target_twice(tmp_path):
+    files = []
+    for name in ("a", "b", "c", "d"):
+        path = tmp_path / "src" / f"{name}.py"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text("import hashlib\n")
+        files.append(str(path))
+
+    worker = StubWorker()
+    daemon = AnalysisDaemon(worker, str(tmp_path / "src"), workers=4)
+    threads = [threading.Thread(target=daemon.work_loop, daemon=True) for _ in range(daemon.workers)]
+    for thread in threads:
+        thread.start()
+
+    started = time.time()
+    for file_path in files + files[:1] * 3:
+        daemon.submit(file_path)
+    while daemon.processed < 7 and time.time() - started < 10:
+        time.sleep(0.05)
+    daemon.stop_event.set()
+
+    assert daemon.processed == 7
+    assert worker.max_total > 1
+    assert worker.max_per_target == 1
+    assert set(daemon.latest) == set(files)
@@ -0,0 +1,55 @@
+import os
+import stat
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+KEY = "ab" * 32
+
+
+def fake_joern(bin_dir, calls_path):
+    """A `joern` that only answers --version and counts its invocations"""
+    path = bin_dir / "joern"
+    path.write_text(f"#!/bin/sh\necho x >> {calls_path}\necho 'Joern v4.0.1'\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return path
+
+
+def store_path(store_root, bin_dir):
+    """CPG path for KEY, resolved in a fresh process as run_joern_script.py does per file"""
+    env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    env.pop("JOERN_VERSION", None)
+    code = f"from cpg_store import CPGStore; print(CPGStore({str(store_root)!r}).path_for({KEY!r}))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(PROJECT_ROOT, "scripts"),
+                            env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def calls(calls_path):
+    return len(calls_path.read_text().split()) if calls_path.exists() else 0
+
+
+def test_joern_version_is_resolved_once_per_binary(tmp_path):
+    bin_dir, store_root, calls_path = tmp_path / "bin", tmp_path / "store", tmp_path / "calls"
+    bin_dir.mkdir()
+    joern = fake_joern(bin_dir, calls_path)
+
+    first = store_path(store_root, bin_dir)
+    assert first == os.path.join(str(store_root), "v4.0.1", "ab", f"{KEY}.bin")
+    assert store_path(store_root, bin_dir) == first
+    assert calls(calls_path) == 1
+
+    # A reinstalled joern is asked again
+    os.utime(joern, (1, 1))
+    store_path(store_root, bin_dir)
+    assert calls(calls_path) == 2
+
+
+def test_identical_files_at_different_paths_get_their_own_cpg(tmp_path):
+    from cpg_store import CPGStore
+
+    for name in ("a.py", "b.py"):
+        (tmp_path / name).write_text("import hashlib\n")
+    store = CPGStore(tmp_path / "store")
+    assert store.key(str(tmp_path / "a.py")) != store.key(str(tmp_path / "b.py"))
+    assert store.key(str(tmp_path / "a.py")) == store.key(os.path.join(str(tmp_path), ".", "a.py"))
@@ -0,0 +1,51 @@
+from dedup import cluster_targets
+
+HELPER = '''
+def helper_{index}(records, limit={index}):
+    total = []
+    for index, record in enumerate(records):
+        if index >= limit:
+            break
+        total.append(record.strip().lower())
+    return ",".join(total)
+'''
+
+# Enough unrelated code that the algorithm-only difference barely moves the similarity score
+TEMPLATE = '''import hashlib
+
+
+def derive(password, salt):
+    digest = hashlib.{call}
+    return digest
+
+''' + "".join(HELPER.format(index=index) for index in range(6))
+
+
+def write_targets(tmp_path, calls):
+    files = []
+    for name, call in calls.items():
+        path = tmp_path / f"{name}.py"
+        path.write_text(TEMPLATE.format(call=call))
+        files.append(str(path))
+    return files
+
+
+def test_algorithm_only_differences_are_not_merged(tmp_path):
+    files = write_targets(tmp_path, {
+        "a": "pbkdf2_hmac('sha256', password, salt, 600000)",
+        "b": "pbkdf2_hmac('md5', password, salt, 600000)",
+        "c": "new('sha1', password, salt, 600000)",
+    })
+    clusters, representatives = cluster_targets(files)
+    assert clusters == []
+    assert sorted(representatives) == sorted(files)
+
+
+def test_identical_algorithms_are_merged(tmp_path):
+    files = write_targets(tmp_path, {
+        "a": "pbkdf2_hmac('sha256', password, salt, 600000)",
+        "b": "pbkdf2_hmac(\"sha256\", password, salt, 600000)",
+    })
+    clusters, representatives = cluster_targets(files)
+    assert len(representatives) == 1
+    assert [m["target"] for m in clusters[0]["members"]] == ["b"]
@@ -0,0 +1,73 @@
+import os
+import subprocess
+
+import pytest
+
+from incremental import dependents, guess_target_names, target_names
+from process_filename import flatten_py_files, load_file_map, write_file_map
+
+# The last four path components collide, so flattening adds a _1 suffix to one of them
+FILES = ["a/pkg/sub/mod/crypto.py", "b/pkg/sub/mod/crypto.py", "util.py"]
+
+
+def make_repo(root):
+    for path in FILES:
+        os.makedirs(os.path.dirname(os.path.join(root, path)) or root, exist_ok=True)
+        with open(os.path.join(root, path), "w") as f:
+            f.write("import hashlib\n")
+    for args in (["init", "-q"], ["add", "."], ["-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "base"]):
+        subprocess.run(["git", "-C", str(root)] + args, check=True)
+
+
+def test_names_come_from_the_baseline_file_map(tmp_path, monkeypatch):
+    repo = tmp_path / "scan_copy"
+    make_repo(repo)
+    monkeypatch.chdir(tmp_path)
+    write_file_map(flatten_py_files(repo, tmp_path / "flat"), repo, "base")
+
+    data, file_map = load_file_map("base")
+    assert data == str(repo)
+    names = target_names(FILES + ["a/pkg/sub/mod/new.py"], file_map, data)
+
+    # Recorded names, including the collision suffix, are reused as they were
+    assert {os.path.splitext(name)[0] for name in os.listdir(tmp_path / "flat")} == {names[p] for p in FILES}
+    assert names["a/pkg/sub/mod/crypto.py"] != names["b/pkg/sub/mod/crypto.py"]
+    assert names["a/pkg/sub/mod/new.py"] == "pkg_sub_mod_new"
+
+
+def test_new_files_do_not_take_a_recorded_name(tmp_path):
+    names = target_names(["x/pkg/sub/mod/crypto.py"], {"a/pkg/sub/mod/crypto.py": "pkg_sub_mod_crypto"}, "/data")
+    assert names["x/pkg/sub/mod/crypto.py"] == "pkg_sub_mod_crypto_1"
+
+
+def test_guessed_names_fail_when_ambiguous(tmp_path):
+    repo = tmp_path / "repo"
+    make_repo(repo)
+    baseline_dir = tmp_path / "baseline"
+    os.makedirs(baseline_dir / "outputs" / "repo_util")
+
+    assert guess_target_names(str(repo), "HEAD", ["util.py"], "repo", str(baseline_dir)) == {"util.py": "repo_util"}
+    with pytest.raises(SystemExit):
+        guess_target_names(str(repo), "HEAD", FILES, "repo", str(baseline_dir))
+    # A file that existed at base must match a baseline target
+    with pytest.raises(SystemExit):
+        guess_target_names(str(repo), "HEAD", ["util.py"], "other", str(baseline_dir))
+
+
+def test_dependents_follow_resolved_imports_only():
+    sources = {
+        "src/app/__init__.py": "",
+        "src/app/crypto.py": "import hashlib\n",
+        "src/app/views.py": "from app import crypto\n",
+        "src/app/api.py": "from .views import render\n",
+        "tools/json.py": "",
+        "tools/report.py": "import json\nimport os\n",
+        "scripts/utils.py": "",
+        "scripts/run.py": "import utils\n",
+        "tools/export.py": "import utils\n",
+    }
+    assert dependents(sources, {"src/app/crypto.py"}) == {"src/app/views.py", "src/app/api.py"}
+    assert dependents(sources, {"src/app/crypto.py"}, max_depth=1) == {"src/app/views.py"}
+    # A stdlib name or a bare last component does not match unrelated repository files
+    assert dependents(sources, {"tools/json.py"}) == set()
+    assert dependents(sources, {"scripts/utils.py"}) == {"scripts/run.py"}
@@ -0,0 +1,18 @@
+import json
+
+from pipeline import JoernServer
+
+
+def test_paths_are_escaped_in_queries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / 'we"ird\\name.py'
+    source.write_text("import hashlib\n")
+    queries = []
+
+    server = JoernServer()
+    server.scripts = {"receiver_trace.sc": "cpg.call.l"}
+    server.query = lambda text, timeout=600: queries.append(text) or ""
+    server.run_scripts(str(source), 'odd"target', "test")
+
+    assert queries[0] == f'importCode({json.dumps(str(source))}, "daemon_odd\\"target")'
+    assert queries[-1] == 'delete("daemon_odd\\"target")'
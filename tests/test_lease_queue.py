@@ -0,0 +1,113 @@
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from lease_queue import LeaseQueue, run_worker, verify
+
+SESSION = "queue_test"
+TARGETS = [f"t{i:02d}" for i in range(12)]
+
+
+class StubWorker:
+    """Records each analysis and writes a marker output instead of running Joern and the LLM"""
+
+    def __init__(self, log_path, delay=0.02):
+        self.log_path = log_path
+        self.delay = delay
+
+    def analyze(self, file_path, target_name, session_tag=None):
+        with open(self.log_path, "a") as f:
+            f.write(f"{target_name}\n")
+        output_dir = os.path.join("run_results", session_tag, "outputs", target_name)
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "marker.txt"), "w") as f:
+            f.write(file_path)
+        time.sleep(self.delay)
+        return {"target": target_name, "verdict": "static_only"}
+
+
+def _worker_process(log_path):
+    run_worker(LeaseQueue(SESSION, lease_ttl=2), StubWorker(log_path), poll_interval=0.1)
+
+
+@pytest.fixture
+def queue_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sources = tmp_path / "src"
+    sources.mkdir()
+    files = []
+    for target in TARGETS:
+        path = sources / f"{target}.py"
+        path.write_text(f"print({target!r})\n")
+        files.append(str(path))
+    LeaseQueue(SESSION).init(files)
+    return tmp_path
+
+
+def test_each_target_processed_exactly_once(queue_dir):
+    # A lease left behind by a worker that died long ago
+    queue = LeaseQueue(SESSION)
+    stale = os.path.join(queue.leases, "t03.lease")
+    with open(stale, "w") as f:
+        json.dump({"worker": "dead:1:0", "token": "dead", "claimed_at": 0}, f)
+    os.utime(stale, (0, 0))
+
+    log_path = str(queue_dir / "analyses.log")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_worker_process, args=(log_path,)) for _ in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    with open(log_path) as f:
+        analysed = f.read().split()
+    assert sorted(analysed) == TARGETS
+    assert verify(queue) == {}
+    for target in TARGETS:
+        assert os.path.exists(os.path.join("run_results", SESSION, "outputs", target, "marker.txt"))
+    assert not os.listdir(queue.leases)
+
+
+def test_reclaimed_worker_cannot_publish(queue_dir):
+    slow, other = LeaseQueue(SESSION, lease_ttl=60), LeaseQueue(SESSION, lease_ttl=60)
+    target = slow.claim()
+    assert slow.owns(target)
+
+    # The slow worker misses its heartbeats; another worker reclaims the lease
+    os.utime(os.path.join(slow.leases, f"{target}.lease"), (0, 0))
+    assert other.claim() == target
+    assert other.owns(target) and not slow.owns(target)
+    assert not slow.heartbeat(target)
+
+    os.makedirs(slow.staging_path("outputs", target))
+    assert not slow.publish(target)
+    slow.release(target)
+    assert other.owns(target)
+
+    os.makedirs(other.staging_path("outputs", target))
+    assert other.publish(target)
+    other.complete(target, {"verdict": "static_only"})
+    assert os.path.isdir(os.path.join("run_results", SESSION, "outputs", target))
+    assert not os.path.exists(os.path.join(other.leases, f"{target}.lease"))
+
+
+def test_staged_skip_logs_are_published_with_the_target(queue_dir):
+    queue = LeaseQueue(SESSION, lease_ttl=60)
+    published, dropped = queue.claim(), queue.claim()
+    staged_log = os.path.join("run_results", queue.staging_tag, "outputs", "skipped_targets_joern.txt")
+    os.makedirs(os.path.dirname(staged_log))
+    with open(staged_log, "w") as f:
+        f.write(f"{published}\n{dropped}\n")
+
+    assert queue.publish(published)
+    queue.discard(dropped)
+
+    with open(os.path.join("run_results", SESSION, "outputs", "skipped_targets_joern.txt")) as f:
+        assert f.read().splitlines() == [published]
+    with open(staged_log) as f:
+        assert f.read() == ""
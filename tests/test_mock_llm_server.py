@@ -0,0 +1,48 @@
+import json
+import threading
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from mock_llm_server import make_server, mock_analysis
+from structured_output import MISUSE_SCHEMA, TYPED_MISUSE_SCHEMA, response_format, schema_for_experiment
+
+CODE = "<code>\nfrom Crypto.Cipher import DES\ncipher = DES.new(key, DES.MODE_ECB)\n</code>"
+
+
+def serve(**kwargs):
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def complete(base_url, prompt, experiment="C1"):
+    request = {"model": "mock", "messages": [{"role": "user", "content": prompt}],
+               "response_format": response_format(schema_for_experiment(experiment))}
+    return requests.post(f"{base_url}/chat/completions", json=request, timeout=10)
+
+
+@pytest.mark.parametrize("typed,schema", [(False, MISUSE_SCHEMA), (True, TYPED_MISUSE_SCHEMA)])
+def test_misuses_have_the_schema_fields(typed, schema):
+    misuses = mock_analysis(f"<rule>\n[1] ...\n[4] ...\n</rule>\n{CODE}", typed)["misuses"]
+    assert [m.get("id", m.get("type")) for m in misuses] == (
+        ["Symmetric Cipher Security", "Mode of Operation"] if typed else [1, 4])
+    assert all(sorted(m) == sorted(schema["required"]) for m in misuses)
+
+
+def test_cache_records_from_upstream_and_replays_offline(tmp_path):
+    upstream, upstream_url = serve()
+    recorder, recorder_url = serve(cache_dir=str(tmp_path), upstream=upstream_url)
+    first = complete(recorder_url, CODE).json()
+    upstream.shutdown()
+    recorder.shutdown()
+
+    replayer, replay_url = serve(cache_dir=str(tmp_path))
+    replayed = complete(replay_url, CODE).json()
+    assert replayed["choices"][0]["message"]["content"] == first["choices"][0]["message"]["content"]
+    assert replayed["usage"] == first["usage"]
+    assert json.loads(replayed["choices"][0]["message"]["content"])["misuses"][0]["category"]
+    # Requests that were never recorded are not invented
+    assert complete(replay_url, CODE, "Z1").status_code == 404
+    replayer.shutdown()
@@ -0,0 +1,102 @@
+import glob
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+import llm_detector
+import packing
+from conftest import PROJECT_ROOT
+from mock_llm_server import MockChatHandler
+
+SOURCES = {
+    "t_des": "from Crypto.Cipher import DES\n\ncipher = DES.new(key, DES.MODE_ECB)\n",
+    "t_hash": "import hashlib\n\ndigest = hashlib.sha256(data).hexdigest()\n",
+    "t_rand": "import random\n\ntoken = random.randint(0, 100)\n",
+}
+
+
+def write_cascade(tmp_path, *stages):
+    path = tmp_path / "cascade.json"
+    path.write_text(json.dumps({"stages": [
+        {"name": name, "model": "mock", "temperature": 0, "max_tokens": 500, "repeat_count": 3} for name in stages
+    ]}))
+    return str(path)
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    """A session with three small analysed targets, run from a scratch project directory"""
+    monkeypatch.chdir(tmp_path)
+    os.symlink(os.path.join(PROJECT_ROOT, "llm"), tmp_path / "llm")
+    os.makedirs(tmp_path / "target")
+    for target, source in SOURCES.items():
+        (tmp_path / "target" / f"{target}.py").write_text(source)
+        output_dir = tmp_path / "run_results" / "s" / "outputs" / target
+        os.makedirs(output_dir)
+        (output_dir / "merged_results.json").write_text(json.dumps({"calls": [source.split("\n")[0]]}))
+    return "s"
+
+
+@pytest.fixture
+def mock_endpoint(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(llm_detector, "_client", None)
+    yield
+    server.shutdown()
+
+
+def read_cascade(session, target):
+    with open(os.path.join("run_results", session, "outputs_llm", target, "C1", "cascade_path.json")) as f:
+        return json.load(f)
+
+
+def test_pack_resolves_against_the_mock_and_counts_each_request_once(session, mock_endpoint, tmp_path, monkeypatch):
+    monkeypatch.setattr(packing, "run_experiment", lambda *a, **k: pytest.fail("unexpected fallback"))
+    packing.run_packed(session, sorted(SOURCES), cascade_path=write_cascade(tmp_path, "fast"))
+
+    cascades = {target: read_cascade(session, target) for target in SOURCES}
+    assert {t: c["final_decision"] for t, c in cascades.items()} == {"t_des": "vuln", "t_hash": "safe", "t_rand": "vuln"}
+    assert all([s["stage"] for s in c["stages"]] == ["fast (packed)"] for c in cascades.values())
+    # One packed request per repetition, shared by the three targets
+    assert sum(c["total_calls"] for c in cascades.values()) == pytest.approx(3)
+    for target in SOURCES:
+        output_dir = os.path.join("run_results", session, "outputs_llm", target, "C1")
+        assert len(glob.glob(os.path.join(output_dir, "llm_results_packed_run*.json"))) == 3
+        assert not glob.glob(os.path.join(output_dir, "llm_results_run*.json"))
+
+
+def test_unparsable_pack_stops_and_retries_the_first_stage(session, tmp_path, monkeypatch):
+    sent, fallbacks = [], {}
+    monkeypatch.setattr(packing, "call_llm", lambda *a, **k: sent.append(1) or ({"error": "bad JSON"}, None))
+    monkeypatch.setattr(packing, "run_experiment", lambda target, *a, **k: fallbacks.update({target: k}))
+    packing.run_packed(session, sorted(SOURCES), cascade_path=write_cascade(tmp_path, "fast", "strong"))
+
+    assert len(sent) == 1
+    assert {t: k["start_stage"] for t, k in fallbacks.items()} == {t: 0 for t in SOURCES}
+    assert sum(k["prior_path"][0]["calls"] for k in fallbacks.values()) == pytest.approx(1)
+
+
+def test_split_pack_vote_moves_up_the_cascade(session, tmp_path, monkeypatch):
+    replies = iter([True, False, True, False, True, False])
+
+    def split_reply(prompt, *args, **kwargs):
+        misuses = [{"id": 1}] if next(replies) else []
+        entry = {"misuses": misuses, "recommendations": [], "analysis_summary": ""}
+        return {"targets": {t: entry for t in SOURCES}}, {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+    fallbacks = {}
+    monkeypatch.setattr(packing, "call_llm", split_reply)
+    monkeypatch.setattr(packing, "run_experiment", lambda target, *a, **k: fallbacks.update({target: k}))
+    packing.run_packed(session, sorted(SOURCES), cascade_path=write_cascade(tmp_path, "fast", "strong"))
+
+    assert {t: k["start_stage"] for t, k in fallbacks.items()} == {t: 1 for t in SOURCES}
+    # Shared usage adds up to what the requests cost
+    assert sum(k["prior_path"][0]["usage"]["total_tokens"] for k in fallbacks.values()) == 45
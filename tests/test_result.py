@@ -0,0 +1,14 @@
+import pytest
+
+from result import read_final_decision
+
+
+@pytest.mark.parametrize("decision,verdict", [("VULN", "misuse"), ("SAFE", "safe"), ("UNCERTAIN", "uncertain")])
+def test_final_decision_mapping(tmp_path, decision, verdict):
+    path = tmp_path / "final_decision.txt"
+    path.write_text(f"Repetition Results:\n1: {decision.lower()}\n\nFinal Decision: {decision}\n")
+    assert read_final_decision(str(path)) == verdict
+
+
+def test_missing_decision(tmp_path):
+    assert read_final_decision(str(tmp_path / "final_decision.txt")) == "missing"
@@ -0,0 +1,42 @@
+import os
+import shutil
+
+from rule_index import CLASSES_PATH, INDEX_NAME, RULES_PATH, load_index, select_rules, target_apis
+
+SOURCE = '''from Crypto.Cipher import DES
+import hashlib
+
+KEY = b"12345678"
+
+
+def encrypt(data):
+    return DES.new(KEY, DES.MODE_ECB).encrypt(data)
+
+
+def fingerprint(data):
+    return hashlib.md5(data).hexdigest()
+'''
+
+
+def test_rules_are_selected_from_the_source():
+    # The static stages only saw the DES receiver; ECB (4) and the weak hash (3) come from the source
+    ids = select_rules(target_apis({"DES.new": ["key"]}, "", SOURCE), load_index())
+    assert {1, 3, 4}.issubset(ids)
+
+
+def test_stale_index_is_cached_outside_the_rules_directory(tmp_path, monkeypatch):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    shutil.copy(RULES_PATH, rules_dir / "rules.json")
+    shutil.copy(os.path.join(os.path.dirname(RULES_PATH), INDEX_NAME), rules_dir / INDEX_NAME)
+    with open(rules_dir / "rules.json", "a") as f:
+        f.write("\n")
+    shipped = (rules_dir / INDEX_NAME).read_text()
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    index = load_index(str(rules_dir / "rules.json"), CLASSES_PATH)
+
+    assert index["rules"]
+    assert (rules_dir / INDEX_NAME).read_text() == shipped
+    assert sorted(os.listdir(rules_dir)) == ["rule_index.json", "rules.json"]
+    assert len(os.listdir(tmp_path / "cache" / "cryptbara")) == 1
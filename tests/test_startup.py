@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cryptbara.startup import measure
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+COMMANDS = ["detect", "llm", "llm-pack", "summary", "dedup", "schedule", "pipeline", "daemon", "queue"]
+HEAVY_MODULES = {"openai", "dotenv", "requests"}
+# Median startup budget per subcommand; override for slow CI machines
+BUDGET_MS = float(os.environ.get("CRYPTBARA_STARTUP_BUDGET_MS", "1000"))
+
+
+def imported_modules(command):
+    """Top-level modules imported by `python -X importtime -m cryptbara <command> --help`"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "cryptbara", command, "--help"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+@pytest.mark.parametrize("command", COMMANDS)
+def test_help_does_not_import_heavy_dependencies(command):
+    assert not imported_modules(command) & HEAVY_MODULES
+
+
+@pytest.mark.parametrize("command", ["--help"] + [f"{c} --help" for c in COMMANDS[:5]])
+def test_startup_within_budget(command):
+    assert measure(command, 3) <= BUDGET_MS
+
+
+def test_exit_code_is_propagated():
+    result = subprocess.run([sys.executable, "-m", "cryptbara", "nosuch"], cwd=PROJECT_ROOT, capture_output=True)
+    assert result.returncode == 2
+    # The budget gate must be able to fail CI
+    result = subprocess.run([sys.executable, "-m", "cryptbara", "startup-time", "--repeat", "1", "--budget-ms", "0.001",
+                             "nosuch"], cwd=PROJECT_ROOT, capture_output=True)
+    assert result.returncode == 1
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+
+import argparse
+import ast
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tokenize
+from itertools import combinations
+from pathlib import Path
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+NUM_PERM = 128
+LSH_ROWS = 8  # rows per band; NUM_PERM // LSH_ROWS bands
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.9
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures are comparable across runs and sessions
+_rng = random.Random(1)
+_PERMUTATIONS = [
+    (_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERM)
+]
+
+CRYPTO_KEYWORDS = {
+    "md5", "sha1", "sha256", "des", "des3", "rc4", "ecb", "cbc", "gcm", "iv", "nonce", "salt",
+    "seed", "iterations", "urandom", "secrets", "randint", "generate_private_key", "md4", "ripemd160",
+}
+
+# String literal: optional prefix (b, r, f, u...), quotes, body
+_STRING_LITERAL = re.compile(r"^([rbuf]*)(\"\"\"|'''|\"|')(.*)\2$", re.IGNORECASE | re.DOTALL)
+
+_SKIPPED_TOKENS = {
+    tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT,
+    tokenize.DEDENT, tokenize.ENCODING, tokenize.ENDMARKER,
+}
+
+
+def _strip_docstrings(tree):
+    """Drop module/class/function docstrings so they do not affect the hash."""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def ast_fingerprint(source):
+    """Hash of the normalized AST (no positions, comments or docstrings). None if unparsable."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    dump = ast.dump(_strip_docstrings(tree), annotate_fields=False, include_attributes=False)
+    return hashlib.sha256(dump.encode("utf-8")).hexdigest()
+
+
+def source_tokens(source):
+    """Return the significant lexical tokens of a Python source."""
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type not in _SKIPPED_TOKENS:
+                tokens.append(tok.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Fall back to whitespace tokens for sources tokenize cannot handle
+        tokens = source.split()
+    return tokens
+
+
+def load_crypto_vocabulary(classes_path=None):
+    """Lower-cased crypto identifiers whose presence must match between near duplicates."""
+    classes_path = classes_path or os.path.join(SCRIPT_DIR, "filtered_classes.txt")
+    vocab = set(CRYPTO_KEYWORDS)
+    if os.path.exists(classes_path):
+        with open(classes_path, "r") as f:
+            vocab.update(line.strip().lower() for line in f if line.strip())
+    return vocab
+
+
+def _profile_token(tok):
+    """Lower-cased token, with the prefix and quotes of a string literal removed ('sha256' -> sha256)."""
+    match = _STRING_LITERAL.match(tok)
+    return (match.group(3) if match else tok).strip().lower()
+
+
+def crypto_profile(tokens, vocab):
+    """
+    Sorted crypto identifiers, crypto-relevant string literals (e.g. hashlib.new('md5')) and
+    numeric literals; near duplicates must agree on these.
+    """
+    profile = []
+    for tok in tokens:
+        value = _profile_token(tok)
+        if value in vocab or value.replace("-", "") in vocab or value.startswith("mode_") or tok[:1].isdigit():
+            profile.append(value)
+    return tuple(sorted(profile))
+
+
+def shingles(tokens, k=SHINGLE_SIZE):
+    """Hashed k-token shingles."""
+    if len(tokens) < k:
+        k = max(len(tokens), 1)
+    result = set()
+    for i in range(max(len(tokens) - k + 1, 1)):
+        shingle = "\x1f".join(tokens[i:i + k])
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        result.add(int.from_bytes(digest, "little") & _MAX_HASH)
+    return result
+
+
+def minhash(shingle_set):
+    """MinHash signature of a shingle set."""
+    if not shingle_set:
+        return [_MAX_HASH] * NUM_PERM
+    return [
+        min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingle_set)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class _UnionFind:
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Keep the lexicographically smallest name as root for stable output
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+def cluster_targets(files, threshold=DEFAULT_THRESHOLD):
+    """
+    Group target files into exact (normalized AST) and near (MinHash/LSH) duplicate clusters.
+    Returns (clusters, representatives) where clusters only lists groups with more than one member.
+    """
+    sources = {}
+    for path in files:
+        target = Path(path).stem
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                sources[target] = (path, f.read())
+        except OSError as e:
+            print(f"[!] Failed to read {path}: {str(e)}")
+
+    names = sorted(sources)
+    uf = _UnionFind(names)
+    links = {}  # (a, b) -> (match, similarity)
+
+    # 1. Exact duplicates by normalized AST hash
+    by_hash = {}
+    for name in names:
+        fingerprint = ast_fingerprint(sources[name][1])
+        if fingerprint is None:
+            continue
+        if fingerprint in by_hash:
+            first = by_hash[fingerprint]
+            uf.union(first, name)
+            links[(first, name)] = ("exact", 1.0)
+        else:
+            by_hash[fingerprint] = name
+
+    # 2. Near duplicates by MinHash with LSH banding (only one entry per exact group)
+    vocab = load_crypto_vocabulary()
+    signatures = {}
+    profiles = {}
+    for name in names:
+        if uf.find(name) == name:
+            tokens = source_tokens(sources[name][1])
+            signatures[name] = minhash(shingles(tokens))
+            profiles[name] = crypto_profile(tokens, vocab)
+
+    buckets = {}
+    for name, sig in signatures.items():
+        for start in range(0, NUM_PERM, LSH_ROWS):
+            key = (start, tuple(sig[start:start + LSH_ROWS]))
+            buckets.setdefault(key, []).append(name)
+
+    checked = set()
+    for bucket in buckets.values():
+        for a, b in combinations(bucket, 2):
+            if (a, b) in checked:
+                continue
+            checked.add((a, b))
+            # A differing algorithm, mode or constant can change the verdict
+            if profiles[a] != profiles[b]:
+                continue
+            similarity = estimate_similarity(signatures[a], signatures[b])
+            if similarity >= threshold:
+                uf.union(a, b)
+                links[(a, b)] = ("near", round(similarity, 4))
+
+    groups = {}
+    for name in names:
+        groups.setdefault(uf.find(name), []).append(name)
+
+    clusters = []
+    representatives = []
+    for root in sorted(groups):
+        representatives.append(sources[root][0])
+        members = [m for m in groups[root] if m != root]
+        if not members:
+            continue
+        entries = []
+        for member in members:
+            match, similarity = _describe_link(member, root, links, signatures)
+            entries.append({
+                "target": member,
+                "source": sources[member][0],
+                "match": match,
+                "similarity": similarity
+            })
+        clusters.append({
+            "representative": root,
+            "source": sources[root][0],
+            "members": entries
+        })
+
+    return clusters, representatives
+
+
+def _describe_link(member, root, links, signatures):
+    """Describe how a member relates to its cluster representative."""
+    for key in ((root, member), (member, root)):
+        if key in links:
+            return links[key]
+    if member in signatures and root in signatures:
+        # Joined transitively through another member
+        return "near", round(estimate_similarity(signatures[member], signatures[root]), 4)
+    return "exact", 1.0
+
+
+def load_clusters(clusters_path):
+    """Return {member_target: representative_target} from a clusters.json file."""
+    if not os.path.exists(clusters_path):
+        return {}
+    with open(clusters_path, "r") as f:
+        data = json.load(f)
+    mapping = {}
+    for cluster in data.get("clusters", []):
+        for member in cluster.get("members", []):
+            mapping[member["target"]] = cluster["representative"]
+    return mapping
+
+
+def write_clusters(clusters, representatives, num_targets, threshold, session_tag):
+    """Record clusters (for auditing) and the representatives to analyse in the session outputs"""
+    output_dir = f"run_results/{session_tag}/outputs"
+    os.makedirs(output_dir, exist_ok=True)
+    clusters_path = os.path.join(output_dir, "clusters.json")
+    with open(clusters_path, "w") as f:
+        json.dump({
+            "threshold": threshold,
+            "num_targets": num_targets,
+            "num_representatives": len(representatives),
+            "clusters": clusters
+        }, f, indent=2)
+
+    reps_path = os.path.join(output_dir, "representatives.txt")
+    with open(reps_path, "w") as f:
+        f.write("\n".join(representatives) + "\n")
+
+    print(f"[✓] {num_targets} targets → {len(representatives)} representatives "
+          f"({len(clusters)} duplicate clusters)")
+    print(f"[✓] Clusters saved at: {clusters_path}")
+    return reps_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate targets and select representatives")
+    parser.add_argument("flat_dir", nargs="?", default="target", help="Directory of flattened targets (default: target)")
+    parser.add_argument("--session", default=os.environ.get("SESSION_TAG", "default"), help="Session tag")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Minimum estimated Jaccard similarity for near duplicates (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    files = sorted(str(p) for p in Path(args.flat_dir).glob("*.py"))
+    if not files:
+        print(f"[!] No targets found in {args.flat_dir}")
+        sys.exit(1)
+
+    clusters, representatives = cluster_targets(files, args.threshold)
+    write_clusters(clusters, representatives, len(files), args.threshold, args.session)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+RULES_PATH = os.path.join(PROJECT_ROOT, "llm", "rules", "rules.json")
+
+POSITIVE_LABELS = {"misuse", "vuln", "vulnerable", "1", "true", "yes"}
+
+
+def load_rule_categories(rules_path=RULES_PATH):
+    """Return {rule_id (str): category}"""
+    with open(rules_path, "r", encoding="utf-8") as f:
+        return {str(rule["id"]): rule["category"] for rule in json.load(f)}
+
+
+def normalize_category(value, categories):
+    """Map a rule id or category name to the rule id (str)"""
+    value = str(value).strip()
+    if value in categories:
+        return value
+    for rule_id, category in categories.items():
+        if category.lower() == value.lower():
+            return rule_id
+    return None
+
+
+def load_labels(labels_path, categories):
+    """
+    Load ground truth from CSV with columns: target,label[,categories]
+    label is misuse/safe; categories is a ';'-separated list of rule ids or category names.
+    """
+    labels = {}
+    with open(labels_path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            target = row["target"].strip()
+            cats = set()
+            for value in (row.get("categories") or "").split(";"):
+                if value.strip():
+                    rule_id = normalize_category(value, categories)
+                    if rule_id is None:
+                        print(f"[!] Unknown category '{value}' for {target}")
+                    else:
+                        cats.add(rule_id)
+            labels[target] = {
+                "misuse": row["label"].strip().lower() in POSITIVE_LABELS,
+                "categories": cats
+            }
+    return labels
+
+
+def _final_stage_runs(output_dir, cascade):
+    """Result files of the last cascade stage visited"""
+    stages = cascade.get("stages", [])
+    if stages and stages[-1].get("results_prefix"):
+        return sorted(glob.glob(os.path.join(output_dir, f"{stages[-1]['results_prefix']}_run*.json")))
+    if len(stages) > 1:
+        return sorted(glob.glob(os.path.join(output_dir, f"llm_results_{stages[-1]['stage']}_run*.json")))
+    return sorted(glob.glob(os.path.join(output_dir, "llm_results_run*.json")))
+
+
+def collect_prediction(output_dir, categories):
+    """Read verdict, reported categories and cost of one target's LLM output directory"""
+    prediction = {"verdict": None, "categories": set(), "tokens": 0, "calls": 0, "wall_time": 0.0}
+
+    decision_path = os.path.join(output_dir, "final_decision.txt")
+    if os.path.exists(decision_path):
+        with open(decision_path, "r") as f:
+            lines = [line for line in f.read().splitlines() if "Final Decision" in line]
+        if lines:
+            prediction["verdict"] = lines[0].split(":")[-1].strip().lower()
+
+    cascade = {}
+    cascade_path = os.path.join(output_dir, "cascade_path.json")
+    if os.path.exists(cascade_path):
+        with open(cascade_path, "r") as f:
+            cascade = json.load(f)
+        prediction["tokens"] = cascade.get("total_usage", {}).get("total_tokens", 0)
+        prediction["calls"] = cascade.get("total_calls", 0)
+        prediction["wall_time"] = cascade.get("wall_time", 0.0)
+
+    # A category counts as reported if most successful runs of the final stage report it
+    runs = []
+    for run_path in _final_stage_runs(output_dir, cascade):
+        with open(run_path, "r") as f:
+            data = json.load(f)
+        if not cascade:
+            prediction["calls"] += 1
+            prediction["tokens"] += data.get("usage", {}).get("total_tokens", 0)
+        if "error" not in data:
+            runs.append({
+                normalize_category(m.get("id", m.get("category", "")), categories)
+                for m in data.get("misuses", [])
+            } - {None})
+
+    if prediction["verdict"] == "vuln" and runs:
+        counts = {}
+        for cats in runs:
+            for cat in cats:
+                counts[cat] = counts.get(cat, 0) + 1
+        prediction["categories"] = {cat for cat, n in counts.items() if n * 2 > len(runs)}
+
+    return prediction
+
+
+def _prf(tp, fp, fn):
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return round(precision, 4), round(recall, 4), round(f1, 4)
+
+
+def evaluate(labels, llm_output_base, experiment, categories):
+    """Compute overall and per-category precision/recall/F1 plus total cost"""
+    tp = fp = fn = tn = 0
+    uncertain = missing = 0
+    per_category = {rule_id: [0, 0, 0] for rule_id in categories}  # tp, fp, fn
+    cost = {"tokens": 0, "calls": 0, "wall_time": 0.0}
+
+    for target, truth in labels.items():
+        output_dir = os.path.join(llm_output_base, target, experiment)
+        pred = collect_prediction(output_dir, categories)
+        for key in cost:
+            cost[key] += pred[key]
+
+        if pred["verdict"] is None:
+            missing += 1
+        elif pred["verdict"] == "uncertain":
+            uncertain += 1
+        predicted = pred["verdict"] == "vuln"
+
+        if predicted and truth["misuse"]:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif truth["misuse"]:
+            fn += 1
+        else:
+            tn += 1
+
+        for rule_id in categories:
+            in_truth = rule_id in truth["categories"]
+            in_pred = rule_id in pred["categories"]
+            if in_truth and in_pred:
+                per_category[rule_id][0] += 1
+            elif in_pred:
+                per_category[rule_id][1] += 1
+            elif in_truth:
+                per_category[rule_id][2] += 1
+
+    precision, recall, f1 = _prf(tp, fp, fn)
+    category_scores = {}
+    for rule_id, (ctp, cfp, cfn) in per_category.items():
+        if ctp + cfp + cfn == 0:
+            continue
+        p, r, f = _prf(ctp, cfp, cfn)
+        category_scores[rule_id] = {
+            "category": categories[rule_id], "precision": p, "recall": r, "f1": f,
+            "tp": ctp, "fp": cfp, "fn": cfn
+        }
+
+    cost["calls"] = round(cost["calls"], 4)
+    cost["wall_time"] = round(cost["wall_time"], 3)
+    return {
+        "precision": precision, "recall": recall, "f1": f1,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "uncertain": uncertain, "missing": missing,
+        "categories": category_scores,
+        **cost
+    }
+
+
+def pareto_frontier(results):
+    """Names of configurations not dominated on (higher F1, fewer tokens)"""
+    frontier = []
+    for name, res in results.items():
+        dominated = any(
+            other["f1"] >= res["f1"] and other["tokens"] <= res["tokens"]
+            and (other["f1"] > res["f1"] or other["tokens"] < res["tokens"])
+            for other_name, other in results.items() if other_name != name
+        )
+        if not dominated:
+            frontier.append(name)
+    return sorted(frontier, key=lambda n: results[n]["tokens"])
+
+
+def run_sweep(sweep_path, labels, session_tag, sweep_dir, force=False):
+    """Run every configuration of a sweep file over the labelled targets"""
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, "llm"))
+    from run_llm_experiments import run_experiment
+
+    with open(sweep_path, "r") as f:
+        configurations = json.load(f)["configurations"]
+
+    merged_base = os.path.join("run_results", session_tag, "outputs")
+    for config in configurations:
+        name = config["name"]
+        experiment = config.get("experiment", "C1")
+        config_dir = os.path.join(sweep_dir, name)
+        os.makedirs(config_dir, exist_ok=True)
+
+        cascade_path = config.get("cascade")
+        if isinstance(cascade_path, dict):
+            inline_path = os.path.join(config_dir, "cascade.json")
+            with open(inline_path, "w") as f:
+                json.dump(cascade_path, f, indent=2)
+            cascade_path = inline_path
+
+        print(f"\n[*] Configuration {name}: experiment={experiment}, cascade={cascade_path or 'default'}, "
+              f"max_call_chain={config.get('max_call_chain')}")
+        for target in sorted(labels):
+            llm_output_base = os.path.join(config_dir, "outputs_llm")
+            done = os.path.join(llm_output_base, target, experiment, "final_decision.txt")
+            if os.path.exists(done) and not force:
+                continue
+            if not os.path.exists(os.path.join(merged_base, target, "merged_results.json")):
+                print(f"[!] Skipping {target} (no static analysis output in session {session_tag})")
+                continue
+            run_experiment(target, experiment, session_tag, cascade_path,
+                           llm_output_base=llm_output_base,
+                           max_call_chain=config.get("max_call_chain"))
+
+    return configurations
+
+
+def write_report(results, categories_by_config, frontier, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    summary_csv = os.path.join(out_dir, "evaluation.csv")
+    with open(summary_csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["configuration", "precision", "recall", "f1", "tokens", "calls",
+                         "wall_time", "uncertain", "missing", "pareto"])
+        for name, res in results.items():
+            writer.writerow([name, res["precision"], res["recall"], res["f1"], res["tokens"],
+                             res["calls"], res["wall_time"], res["uncertain"], res["missing"],
+                             "yes" if name in frontier else ""])
+
+    categories_csv = os.path.join(out_dir, "evaluation_categories.csv")
+    with open(categories_csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["configuration", "rule_id", "category", "precision", "recall", "f1", "tp", "fp", "fn"])
+        for name, scores in categories_by_config.items():
+            for rule_id, s in sorted(scores.items(), key=lambda item: int(item[0])):
+                writer.writerow([name, rule_id, s["category"], s["precision"], s["recall"], s["f1"],
+                                 s["tp"], s["fp"], s["fn"]])
+
+    with open(os.path.join(out_dir, "pareto.json"), "w") as f:
+        json.dump({"frontier": frontier, "results": results}, f, indent=2)
+
+    print(f"\n{'configuration':<24} {'P':>6} {'R':>6} {'F1':>6} {'tokens':>10} {'calls':>6} {'time(s)':>9}")
+    for name, res in results.items():
+        marker = " *" if name in frontier else ""
+        print(f"{name:<24} {res['precision']:>6.3f} {res['recall']:>6.3f} {res['f1']:>6.3f} "
+              f"{res['tokens']:>10} {res['calls']:>6} {res['wall_time']:>9.1f}{marker}")
+    print("(* = Pareto frontier on F1 vs. tokens)")
+    print(f"[✓] Evaluation saved to: {summary_csv}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy-vs-cost evaluation over a labelled corpus")
+    parser.add_argument("--labels", required=True, help="Ground truth CSV (target,label[,categories])")
+    parser.add_argument("--session", required=True, help="Session tag with static analysis outputs")
+    parser.add_argument("--sweep", help="Sweep configuration JSON (default: evaluate the session's outputs_llm)")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint for the sweep (e.g. utils/mock_llm_server.py)")
+    parser.add_argument("--cache", help="Replay the sweep from responses recorded in this directory (no API calls)")
+    parser.add_argument("--upstream", help="With --cache: send uncached requests to this endpoint and record them "
+                                           "(e.g. https://api.openai.com/v1)")
+    parser.add_argument("--force", action="store_true", help="Re-run targets that already have a final decision")
+    args = parser.parse_args()
+
+    categories = load_rule_categories()
+    labels = load_labels(args.labels, categories)
+    session_dir = os.path.join("run_results", args.session)
+    print(f"[+] Loaded {len(labels)} labelled targets")
+
+    results = {}
+    if args.sweep:
+        cache_server = None
+        if args.cache:
+            # In-process replay endpoint; repeated sweeps cost nothing once recorded
+            from mock_llm_server import make_server
+            cache_server = make_server(cache_dir=args.cache, upstream=args.upstream)
+            threading.Thread(target=cache_server.serve_forever, daemon=True).start()
+            args.base_url = f"http://127.0.0.1:{cache_server.server_address[1]}/v1"
+            print(f"[*] Replaying responses from {args.cache}" + (f" (recording from {args.upstream})" if args.upstream else ""))
+        if args.base_url:
+            os.environ["OPENAI_BASE_URL"] = args.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "mock")
+        sweep_dir = os.path.join(session_dir, "sweeps")
+        configurations = run_sweep(args.sweep, labels, args.session, sweep_dir, args.force)
+        if cache_server:
+            cache_server.shutdown()
+        for config in configurations:
+            llm_output_base = os.path.join(sweep_dir, config["name"], "outputs_llm")
+            results[config["name"]] = evaluate(labels, llm_output_base, config.get("experiment", "C1"), categories)
+        out_dir = sweep_dir
+    else:
+        results["session"] = evaluate(labels, os.path.join(session_dir, "outputs_llm"), "C1", categories)
+        out_dir = session_dir
+
+    categories_by_config = {name: res.pop("categories") for name, res in results.items()}
+    frontier = pareto_frontier(results)
+    write_report(results, categories_by_config, frontier, out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+RULES_PATH = os.path.join(SCRIPT_DIR, "..", "llm", "rules", "rules.json")
+
+# Deterministic stand-in for a model: one pattern per rules.json id
+MISUSE_PATTERNS = {
+    1: r"\b(DES|DES3|ARC4|RC4|Blowfish)\.new\(",
+    2: r"(key_size\s*=\s*|generate\(|generate_private_key\()\s*(512|768|1024)\b",
+    3: r"\b(md5|sha1|MD5|SHA1)\b",
+    4: r"MODE_ECB|modes\.ECB\(",
+    5: r"\bkey\s*=\s*b?[\"']",
+    6: r"\brandom\.(random|randint|choice|getrandbits)\(",
+    7: r"\brandom\.seed\(",
+    8: r"\biv\s*=\s*b?[\"']",
+    9: r"\bsalt\s*=\s*b?[\"']",
+    10: r"iterations\s*=\s*\d{1,5}\b",
+    11: r"\bChaCha20\.new\(",
+}
+
+
+# One section per target of a packed prompt (llm/templates/C1_packed.txt)
+TARGET_SECTION = re.compile(r'<target name="([^"]*)">(.*?)</target>', re.DOTALL)
+
+
+def extract_code(prompt):
+    """Return the <code> section of a prompt (or the whole prompt)"""
+    match = re.search(r"<code>(.*?)</code>", prompt, re.DOTALL)
+    return match.group(1) if match else prompt
+
+
+def prompt_rule_ids(prompt):
+    """Rule ids listed in the <rule> section of a prompt with selected rules (None: all rules)"""
+    match = re.search(r"<rule>(.*?)</rule>", prompt, re.DOTALL)
+    ids = {int(i) for i in re.findall(r"^\[(\d+)\]", match.group(1), re.MULTILINE)} if match else set()
+    return ids or None
+
+
+def load_categories(rules_path=RULES_PATH):
+    """{rule id: category} from rules.json"""
+    with open(rules_path, "r") as f:
+        return {rule["id"]: rule["category"] for rule in json.load(f)}
+
+
+CATEGORIES = load_categories()
+
+
+def typed_misuses(request, prompt):
+    """True if misuses are described by a free-form "type" (Z1) rather than a rule id and category"""
+    schema = request.get("response_format", {}).get("json_schema", {}).get("schema", {})
+    items = schema.get("properties", {}).get("misuses", {}).get("items")
+    if items is not None:
+        return "type" in items.get("required", [])
+    return "<rule>" not in prompt and "<target name=" not in prompt
+
+
+def mock_analysis(prompt, typed=False):
+    """Build a response in the template's JSON format; packed prompts get one entry per target"""
+    rule_ids = prompt_rule_ids(prompt)
+    sections = TARGET_SECTION.findall(prompt)
+    if sections:
+        return {"targets": {name: analyse_code(extract_code(section), rule_ids) for name, section in sections}}
+    return analyse_code(extract_code(prompt), rule_ids, typed)
+
+
+def analyse_code(code, rule_ids=None, typed=False):
+    """Misuses found by simple pattern matches, restricted to the prompt's rules"""
+    misuses = []
+    for rule_id, pattern in MISUSE_PATTERNS.items():
+        if rule_ids is not None and rule_id not in rule_ids:
+            continue
+        match = re.search(pattern, code)
+        if match:
+            line = code[:match.start()].count("\n") + 1
+            # Same fields as the strict MISUSE_SCHEMA / TYPED_MISUSE_SCHEMA of llm/structured_output.py
+            label = {"type": CATEGORIES[rule_id]} if typed else {"id": rule_id, "category": CATEGORIES[rule_id]}
+            misuses.append(dict(label, **{
+                "location": f"line {line}",
+                "description": f"Pattern match: {match.group(0)}",
+                "severity": "High"
+            }))
+    return {
+        "misuses": misuses,
+        "recommendations": [],
+        "analysis_summary": f"{len(misuses)} pattern match(es) (mock endpoint)"
+    }
+
+
+class ResponseCache:
+    """
+    Recorded completions keyed by the request (model, messages, sampling and response format).
+    Identical requests (repetitions) get the recordings in the order they were made, cycling.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.replayed = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(request):
+        fields = {k: request.get(k) for k in ("model", "messages", "temperature", "max_tokens", "response_format")}
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def replay(self, key):
+        """(content, usage) of the next recording for a request, or None"""
+        with self.lock:
+            recordings = self._load(key)
+            if not recordings:
+                return None
+            index = self.replayed.get(key, 0)
+            self.replayed[key] = index + 1
+            recording = recordings[index % len(recordings)]
+            return recording["content"], recording["usage"]
+
+    def record(self, key, content, usage):
+        with self.lock:
+            recordings = self._load(key)
+            recordings.append({"content": content, "usage": usage})
+            self.replayed[key] = len(recordings)
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(recordings, f)
+            os.replace(tmp_path, path)
+
+
+def fetch_upstream(base_url, request):
+    """(content, usage) of a non-streamed completion from a real OpenAI-compatible endpoint"""
+    import requests
+
+    body = {k: v for k, v in request.items() if k not in ("stream", "stream_options")}
+    response = requests.post(f"{base_url.rstrip('/')}/chat/completions", json=body, timeout=600,
+                             headers={"Authorization": f"Bearer {os.environ.get('OPENAI_API_KEY', '')}"})
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"] or "", data["usage"]
+
+
+def mock_completion(request, prompt):
+    """(content, usage) answered by the pattern matcher"""
+    analysis = json.dumps(mock_analysis(prompt, typed_misuses(request, prompt)), indent=2)
+    # Structured output replies are bare JSON
+    if request.get("response_format", {}).get("type") == "json_schema":
+        content = analysis
+    else:
+        content = "```json\n" + analysis + "\n```"
+
+    # Rough token estimate (~4 characters per token)
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return content, {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    """
+    Answers chat completions from the pattern matcher or, if the server has a response_cache,
+    by replaying recorded completions (recording misses from server.upstream when set)
+    """
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+
+        cache = getattr(self.server, "response_cache", None)
+        if cache is None:
+            content, usage = mock_completion(request, prompt)
+        else:
+            key = ResponseCache.key(request)
+            replayed = cache.replay(key)
+            upstream = getattr(self.server, "upstream", None)
+            if replayed is not None:
+                content, usage = replayed
+            elif upstream:
+                try:
+                    content, usage = fetch_upstream(upstream, request)
+                except Exception as e:
+                    self._send_error_json(502, f"Upstream request failed: {str(e)}")
+                    return
+                cache.record(key, content, usage)
+            else:
+                self._send_error_json(404, f"No cached response for request {key[:12]}")
+                return
+
+        completion = {
+            "id": f"mock-{int(time.time() * 1000)}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock")
+        }
+
+        if request.get("stream"):
+            self._stream(completion, content, usage, request.get("stream_options", {}).get("include_usage"))
+            return
+
+        body = json.dumps(dict(completion,
+            object="chat.completion",
+            choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            usage=usage
+        )).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status, message):
+        body = json.dumps({"error": {"message": message, "type": "invalid_request_error"}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, completion, content, usage, include_usage, chunk_size=16):
+        """Server-sent events in the chat.completion.chunk format"""
+        def event(choices, **extra):
+            payload = dict(completion, object="chat.completion.chunk", choices=choices, **extra)
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for i in range(0, len(content), chunk_size):
+                event([{"index": 0, "delta": {"content": content[i:i + chunk_size]}, "finish_reason": None}])
+            event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                event([], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped reading early
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=0, cache_dir=None, upstream=None):
+    """Mock endpoint; with cache_dir it replays recorded responses (recording misses from upstream)"""
+    server = ThreadingHTTPServer((host, port), MockChatHandler)
+    server.response_cache = ResponseCache(cache_dir) if cache_dir else None
+    server.upstream = upstream
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock endpoint for offline sweeps")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache", help="Replay recorded responses from this directory instead of pattern matching")
+    parser.add_argument("--upstream", help="With --cache: forward uncached requests to this endpoint and record them "
+                                           "(e.g. https://api.openai.com/v1)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.cache, args.upstream)
+    print(f"[*] Mock LLM endpoint listening on http://{args.host}:{args.port}/v1")
+    if args.cache:
+        print(f"[*] Replaying responses from {args.cache}" + (f", recording misses from {args.upstream}" if args.upstream else ""))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,64 @@
+import json
 import os
 import shutil
 from pathlib import Path
 import sys
 
+FILE_MAP = "file_map.json"
+
+def flat_name_for(file):
+    """Flattened file name that retains a hint of the original path (last 4 components)"""
+    parts = Path(file).parts[-4:]
+    return "_".join(part.replace(".py", "") for part in parts) + ".py"
+
+def unique_flat_name(file, taken):
+    """flat_name_for(file), with a _<n> suffix if the name is already taken"""
+    original = flat_name = flat_name_for(file)
+    counter = 1
+    while flat_name in taken:
+        name, ext = os.path.splitext(original)
+        flat_name = f"{name}_{counter}{ext}"
+        counter += 1
+    return flat_name
+
 def flatten_py_files(source_dir, flat_dir="target"):
+    """Copy every .py file under source_dir into flat_dir; returns {target name: path relative to source_dir}"""
     os.makedirs(flat_dir, exist_ok=True)
-    seen = set()
+    taken = {name for name in os.listdir(flat_dir) if name.endswith(".py")}
+    mapping = {}
 
     for file in Path(source_dir).rglob("*.py"):
-        # Retain a hint of the original path (last 4 components)
-        parts = file.parts[-4:]
-        flat_name = "_".join(part.replace(".py", "") for part in parts) + ".py"
-
         # Prevent name collisions
-        original = flat_name
-        counter = 1
-        while flat_name in seen or os.path.exists(Path(flat_dir) / flat_name):
-            name, ext = os.path.splitext(original)
-            flat_name = f"{name}_{counter}{ext}"
-            counter += 1
-
-        seen.add(flat_name)
+        flat_name = unique_flat_name(file, taken)
+        taken.add(flat_name)
+        mapping[os.path.splitext(flat_name)[0]] = file.relative_to(source_dir).as_posix()
         shutil.copy(file, Path(flat_dir) / flat_name)
         print(f"[+] Copied: {file} → {flat_dir}/{flat_name}")
+    return mapping
 
-if __name__ == "__main__":
+def write_file_map(mapping, source_dir, session_tag):
+    """Record which source file each target came from, so later scans (diff-scan) can reuse the names"""
+    output_dir = os.path.join("run_results", session_tag, "outputs")
+    os.makedirs(output_dir, exist_ok=True)
+    map_path = os.path.join(output_dir, FILE_MAP)
+    with open(map_path, "w") as f:
+        json.dump({"data": os.path.abspath(source_dir), "targets": dict(sorted(mapping.items()))}, f, indent=2)
+    return map_path
+
+def load_file_map(session_tag):
+    """(--data path, {source path: target name}) recorded for a session, or None if it has no file map"""
+    map_path = os.path.join("run_results", session_tag, "outputs", FILE_MAP)
+    if not os.path.exists(map_path):
+        return None
+    with open(map_path, "r") as f:
+        data = json.load(f)
+    return data.get("data"), {path: target for target, path in data.get("targets", {}).items()}
+
+def main():
     source = sys.argv[1] if len(sys.argv) > 1 else "target_files"
-    flatten_py_files(source)
+    mapping = flatten_py_files(source)
+    if os.environ.get("SESSION_TAG"):
+        write_file_map(mapping, source, os.environ["SESSION_TAG"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+import argparse
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import runpy
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Profiling is switched on for every stage process through the environment:
+#   CRYPTBARA_PROFILE=sample    stack sampling + tracemalloc (low overhead)
+#   CRYPTBARA_PROFILE=cprofile  additionally a deterministic cProfile of the stage
+PROFILE_ENV = "CRYPTBARA_PROFILE"
+PROFILE_MODES = ("sample", "cprofile")
+SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 25
+
+
+def profile_mode():
+    """Active profiling mode, or None"""
+    mode = os.environ.get(PROFILE_ENV, "").strip().lower()
+    if mode in ("", "0", "off", "false"):
+        return None
+    return mode if mode in PROFILE_MODES else "sample"
+
+
+def profile_dir(target_name, session_tag=None):
+    session_tag = session_tag or os.environ.get("SESSION_TAG") or "default"
+    path = os.path.join("run_results", session_tag, "profiles", target_name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _unique_base(directory, name):
+    """<directory>/<name>, or <name>_2, _3... if a stage is profiled more than once (e.g. repetitions)"""
+    base, index = os.path.join(directory, name), 2
+    while glob.glob(base + ".*"):
+        base = os.path.join(directory, f"{name}_{index}")
+        index += 1
+    return base
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval and counts collapsed stacks"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        """Brendan Gregg's collapsed format: 'frame;frame;frame count' (input for flamegraph.pl/speedscope)"""
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_stage(stage, target_name, session_tag=None):
+    """Profile the enclosed block into run_results/<session>/profiles/<target>/<stage>.* (no-op unless enabled)"""
+    mode = profile_mode()
+    if mode is None:
+        yield
+        return
+
+    base = _unique_base(profile_dir(target_name, session_tag), stage)
+    sampler = StackSampler(threading.get_ident())
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(10)
+    if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+; on 3.8 the peak includes earlier stages
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    sampler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        sampler.stop()
+        wall = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        sampler.write_collapsed(base + ".collapsed")
+        _write_memory(base + ".memory.txt", snapshot, peak)
+        if profiler:
+            profiler.dump_stats(base + ".prof")
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(40)
+            with open(base + ".txt", "w") as f:
+                f.write(text.getvalue())
+
+        with open(os.path.join(os.path.dirname(base), "summary.jsonl"), "a") as f:
+            f.write(json.dumps({
+                "stage": os.path.basename(base),
+                "target": target_name,
+                "mode": mode,
+                "wall_time": round(wall, 4),
+                "samples": sum(sampler.counts.values()),
+                "peak_memory_kb": round(peak / 1024, 1)
+            }) + "\n")
+
+
+def _write_memory(path, snapshot, peak):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__)
+    ])
+    with open(path, "w") as f:
+        f.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n\n")
+        f.write(f"Top {TOP_ALLOCATIONS} allocation sites (live at stage end):\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+
+
+def jvm_profile_options(target_name, name, session_tag=None):
+    """JAVA_OPTS value enabling Java Flight Recorder for one Joern process, and the recording path"""
+    jfr_path = os.path.abspath(_unique_base(profile_dir(target_name, session_tag), name) + ".jfr")
+    options = f"-XX:StartFlightRecording=filename={jfr_path},settings=profile,dumponexit=true"
+    existing = os.environ.get("JAVA_OPTS", "")
+    return (f"{existing} {options}".strip()), jfr_path
+
+
+def jfr_to_collapsed(jfr_path):
+    """Convert the execution samples of a JFR recording to collapsed stacks (needs the JDK `jfr` tool)"""
+    if not os.path.exists(jfr_path) or not shutil.which("jfr"):
+        return None
+    result = subprocess.run(["jfr", "print", "--json", "--events", "jdk.ExecutionSample", jfr_path],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    try:
+        events = json.loads(result.stdout).get("recording", {}).get("events", [])
+    except json.JSONDecodeError:
+        return None
+
+    counts = Counter()
+    for event in events:
+        frames = (event.get("values", {}).get("stackTrace") or {}).get("frames", [])
+        names = [f"{frame['method']['type']['name']}.{frame['method']['name']}" for frame in frames
+                 if frame.get("method")]
+        if names:
+            # JFR lists the top frame first
+            counts[";".join(reversed(names))] += 1
+
+    out_path = os.path.splitext(jfr_path)[0] + ".collapsed"
+    with open(out_path, "w") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+    return out_path
+
+
+def merge_collapsed(session_tag):
+    """Concatenate every profile of a session into profiles/all.collapsed, rooted at target;stage"""
+    root = os.path.join("run_results", session_tag, "profiles")
+    out_path = os.path.join(root, "all.collapsed")
+    for jfr_path in glob.glob(os.path.join(root, "*", "*.jfr")):
+        if not os.path.exists(os.path.splitext(jfr_path)[0] + ".collapsed") and not jfr_to_collapsed(jfr_path):
+            print(f"[!] Could not convert {jfr_path} (is the JDK `jfr` tool on PATH?)")
+    merged = Counter()
+    for path in glob.glob(os.path.join(root, "*", "*.collapsed")):
+        target = os.path.basename(os.path.dirname(path))
+        stage = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    merged[f"{target};{stage};{stack}"] += int(count)
+    with open(out_path, "w") as f:
+        for stack, count in merged.most_common():
+            f.write(f"{stack} {count}\n")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiling of CRYPTBARA stages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    exec_parser = subparsers.add_parser("exec", help="Run a stage script under the profiler")
+    exec_parser.add_argument("--target", required=True, help="Target name (profile directory)")
+    exec_parser.add_argument("--stage", help="Stage name (default: script name)")
+    exec_parser.add_argument("script", help="Stage script")
+    exec_parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the script")
+
+    merge_parser = subparsers.add_parser("merge", help="Merge a session's profiles into one collapsed-stack file")
+    merge_parser.add_argument("--session", required=True, help="Session tag")
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        print(f"[✓] Collapsed stacks written to {merge_collapsed(args.session)}")
+        return
+
+    script = os.path.abspath(args.script)
+    stage = args.stage or os.path.splitext(os.path.basename(script))[0]
+    os.environ.setdefault(PROFILE_ENV, "sample")
+    sys.argv = [script] + args.args
+    sys.path.insert(0, os.path.dirname(script))
+
+    exit_code = 0
+    with profile_stage(stage, args.target):
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,43 +2,105 @@
 
 import os
 import csv
+import json
 import argparse
+from dedup import load_clusters
+from scheduler import load_schedule
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--session", required=True, help="Session tag (e.g., 20240525_2300)")
-    parser.add_argument("--base", default=".", help="Base project directory (default: current directory)")
-    args = parser.parse_args()
+def read_final_decision(final_decision_path):
+    """Map a final_decision.txt to a summary verdict"""
+    if not os.path.exists(final_decision_path):
+        return "missing"
+    with open(final_decision_path, "r") as dec_file:
+        content = dec_file.read().strip()
+        lines = [line for line in content.splitlines() if "Final Decision" in line]
+        if lines:
+            decision = lines[0].split(":")[-1].strip().lower()
+            # "uncertain" (no majority in the last cascade stage) is reported as such, not as safe
+            return {"vuln": "misuse", "safe": "safe"}.get(decision, decision)
+        return "invalid"
 
-    session_tag = args.session
-    base_dir = args.base  # default = current directory
+def collect_verdicts(session_tag, base_dir="."):
+    """Return {target: verdict} for every target with LLM output in a session"""
+    llm_base_dir = os.path.join(base_dir, "run_results", session_tag, "outputs_llm")
+    if not os.path.isdir(llm_base_dir):
+        return {}
+    return {
+        target_dir: read_final_decision(os.path.join(llm_base_dir, target_dir, "C1", "final_decision.txt"))
+        for target_dir in sorted(os.listdir(llm_base_dir))
+    }
+
+def summarize(session_tag, base_dir="."):
+    """Write results_<session>_llm_summary.csv and return its path"""
     llm_base_dir = os.path.join(base_dir, "run_results", session_tag, "outputs_llm")
     out_csv = os.path.join(base_dir, f"results_{session_tag}_llm_summary.csv")
+    clusters_path = os.path.join(base_dir, "run_results", session_tag, "outputs", "clusters.json")
+
+    # member -> representative, for targets skipped as duplicates
+    cluster_map = load_clusters(clusters_path)
+    members_by_rep = {}
+    for member, rep in cluster_map.items():
+        members_by_rep.setdefault(rep, []).append(member)
+
+    # Risk-prioritised runs list targets by rank, including those the budget left unanalysed
+    schedule = load_schedule(session_tag, base_dir)
 
     with open(out_csv, "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["target", "verdict"])
+        writer.writerow(["target", "verdict", "representative", "decision_path", "tokens", "risk"])
+        total_tokens = 0
+        total_calls = 0
 
-        for target_dir in sorted(os.listdir(llm_base_dir)):
+        target_dirs = sorted(os.listdir(llm_base_dir)) if os.path.isdir(llm_base_dir) else []
+        target_dirs.sort(key=lambda t: schedule.get(t, {}).get("rank", float("inf")))
+        for target_dir in target_dirs:
             target_path = os.path.join(llm_base_dir, target_dir)
             c1_path = os.path.join(target_path, "C1")
             final_decision_path = os.path.join(c1_path, "final_decision.txt")
 
-            if not os.path.exists(final_decision_path):
-                verdict = "missing"
-            else:
-                with open(final_decision_path, "r") as dec_file:
-                    content = dec_file.read().strip()
-                    lines = [line for line in content.splitlines() if "Final Decision" in line]
-                    if lines:
-                        decision = lines[0].split(":")[-1].strip().lower()
-                        verdict = "misuse" if decision == "vuln" else "safe"
-                    else:
-                        verdict = "invalid"
+            verdict = read_final_decision(final_decision_path)
+
+            # Cascade stages visited and tokens spent for this target
+            decision_path, tokens = "", ""
+            cascade_path = os.path.join(c1_path, "cascade_path.json")
+            if os.path.exists(cascade_path):
+                with open(cascade_path, "r") as cascade_file:
+                    cascade = json.load(cascade_file)
+                decision_path = " > ".join(step["stage"] for step in cascade.get("stages", []))
+                tokens = cascade.get("total_usage", {}).get("total_tokens", 0)
+                total_tokens += tokens
+                total_calls += cascade.get("total_calls", 0)
 
-            writer.writerow([target_dir, verdict])
+            risk = schedule.get(target_dir, {}).get("score", "")
+            writer.writerow([target_dir, verdict, "", decision_path, tokens, risk])
+
+            # Propagate the representative's verdict to its duplicates
+            for member in sorted(members_by_rep.get(target_dir, [])):
+                writer.writerow([member, verdict, target_dir, "", "", risk])
+
+        # Targets not started before the budget ran out
+        not_run = [t for t, entry in schedule.items() if entry.get("status") == "not_run" and t not in target_dirs]
+        for target in sorted(not_run, key=lambda t: schedule[t]["rank"]):
+            writer.writerow([target, "not_run", "", "", "", schedule[target]["score"]])
+            for member in sorted(members_by_rep.get(target, [])):
+                writer.writerow([member, "not_run", target, "", "", schedule[target]["score"]])
+
+        # Duplicates whose representative produced no LLM output
+        for rep in sorted(set(members_by_rep) - set(target_dirs) - set(not_run)):
+            for member in sorted(members_by_rep[rep]):
+                writer.writerow([member, "missing", rep, "", "", ""])
 
     print(f"[✓] LLM summary saved to: {out_csv}")
+    print(f"[+] LLM calls: {round(total_calls, 4)}, total tokens: {total_tokens}")
+    return out_csv
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--session", required=True, help="Session tag (e.g., 20240525_2300)")
+    parser.add_argument("--base", default=".", help="Base project directory (default: current directory)")
+    args = parser.parse_args()
+
+    summarize(args.session, args.base)  # base default = current directory
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from dedup import load_crypto_vocabulary, source_tokens
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+RULES_PATH = os.path.join(PROJECT_ROOT, "llm", "rules", "rules.json")
+
+SEVERITY_WEIGHTS = {"High": 3.0, "Medium": 2.0, "Low": 1.0}
+RULE_MATCH_WEIGHT = 5.0
+CRYPTO_CALL_WEIGHT = 1.0
+MAX_CRYPTO_CALLS = 50
+SENSITIVE_CONSTANT_WEIGHT = 3.0
+CONSTANT_WEIGHT = 0.5
+MAX_CONSTANTS = 10
+
+# Hardcoded values assigned to these names are likely keys, IVs, salts or seeds
+SENSITIVE_NAME = re.compile(r"key|iv|nonce|salt|secret|passw|seed|token", re.IGNORECASE)
+_STRING_TOKEN = re.compile(r"^[rbuf]*['\"]", re.IGNORECASE)
+_WORD = re.compile(r"[A-Za-z_]\w*|\d+")
+
+
+def _words(text):
+    """Lower-cased identifiers and numbers, with string literals removed"""
+    text = re.sub(r"[rbuf]*(\"[^\"]*\"|'[^']*')", " ", text, flags=re.IGNORECASE)
+    return {w.lower() for w in _WORD.findall(text)}
+
+
+def load_rule_signatures(rules_path=RULES_PATH):
+    """
+    One signature per misuse_example fragment of rules.json: the fragment's words, and those
+    not in the safe example. A source matches if it has all words and at least one distinctive word.
+    """
+    with open(rules_path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    signatures = []
+    for rule in rules:
+        safe_words = _words(rule.get("safe_example", ""))
+        for fragment in rule.get("misuse_example", "").split(" / "):
+            words = _words(fragment)
+            distinctive = words - safe_words
+            if distinctive:
+                signatures.append({
+                    "id": rule["id"],
+                    "weight": SEVERITY_WEIGHTS.get(rule.get("severity"), 1.0),
+                    "words": words,
+                    "distinctive": distinctive
+                })
+    return signatures
+
+
+def count_crypto_calls(receiver_trace_path):
+    """Number of crypto API calls reported by the Joern receiver trace"""
+    with open(receiver_trace_path, "r", errors="replace") as f:
+        return sum(1 for line in f if line.strip().startswith("[+] Call:"))
+
+
+def hardcoded_constants(source, ast_output_path=None):
+    """Hardcoded constants from the AST stage output, or extracted from the source if absent"""
+    if ast_output_path and os.path.exists(ast_output_path):
+        with open(ast_output_path, "r") as f:
+            inter = json.load(f)
+    else:
+        sys.path.insert(0, os.path.join(PROJECT_ROOT, "scripts"))
+        from ast_interflow import ASTInterproceduralDependencyExtractor
+        try:
+            inter = ASTInterproceduralDependencyExtractor().extract(source)
+        except (SyntaxError, ValueError):
+            return []
+    return [const for data in inter.values() for const in data.get("hardcoded_constants", [])]
+
+
+def score_target(target_name, source_path, session_tag, signatures, vocab):
+    """Risk score of one target from cheap static signals (higher is analysed first)"""
+    output_dir = os.path.join("run_results", session_tag, "outputs", target_name)
+    try:
+        with open(source_path, "r", encoding="utf-8", errors="replace") as f:
+            source = f.read()
+    except OSError:
+        source = ""
+    tokens = source_tokens(source)
+    words = {tok.lower() for tok in tokens if not _STRING_TOKEN.match(tok)}
+
+    # Joern's count once the static stage has run; crypto identifiers in the source before that
+    receiver_trace = os.path.join(output_dir, "joern", "receiver_trace_output.txt")
+    if os.path.exists(receiver_trace):
+        crypto_calls = count_crypto_calls(receiver_trace)
+    else:
+        crypto_calls = sum(1 for tok in tokens if tok.lower() in vocab)
+
+    constants = hardcoded_constants(source, os.path.join(output_dir, "ast", "interprocedural_dependencies.json"))
+    sensitive = [c for c in constants if SENSITIVE_NAME.search(str(c.get("variable", "")))]
+
+    matched = {}
+    for signature in signatures:
+        if signature["words"] <= words and signature["distinctive"] & words:
+            matched[signature["id"]] = max(matched.get(signature["id"], 0), signature["weight"])
+
+    score = (CRYPTO_CALL_WEIGHT * min(crypto_calls, MAX_CRYPTO_CALLS)
+             + SENSITIVE_CONSTANT_WEIGHT * len(sensitive)
+             + CONSTANT_WEIGHT * min(len(constants) - len(sensitive), MAX_CONSTANTS)
+             + RULE_MATCH_WEIGHT * sum(matched.values()))
+    return {
+        "target": target_name,
+        "score": round(score, 2),
+        "crypto_calls": crypto_calls,
+        "hardcoded_constants": len(constants),
+        "sensitive_constants": len(sensitive),
+        "rule_matches": sorted(matched)
+    }
+
+
+def rank_targets(files, session_tag, rules_path=RULES_PATH):
+    """Score target sources and return them in descending risk (ties by name)"""
+    signatures = load_rule_signatures(rules_path)
+    vocab = load_crypto_vocabulary()
+    ranked = [
+        dict(score_target(os.path.splitext(os.path.basename(p))[0], p, session_tag, signatures, vocab), file=p)
+        for p in files
+    ]
+    ranked.sort(key=lambda entry: (-entry["score"], entry["target"]))
+    for rank, entry in enumerate(ranked, start=1):
+        entry["rank"] = rank
+        entry["status"] = "pending"
+    return ranked
+
+
+def target_tokens(session_tag, target_name):
+    """Tokens recorded in a target's cascade_path.json (0 if none)"""
+    path = os.path.join("run_results", session_tag, "outputs_llm", target_name, "C1", "cascade_path.json")
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as f:
+        return json.load(f).get("total_usage", {}).get("total_tokens", 0)
+
+
+class Budget:
+    """Wall-time and token limits, checked between targets"""
+
+    def __init__(self, max_wall_time=None, max_tokens=None):
+        self.max_wall_time = max_wall_time
+        self.max_tokens = max_tokens
+        self.started = time.time()
+        self.tokens = 0
+        self.targets = 0
+
+    def charge(self, tokens):
+        self.tokens += tokens
+        self.targets += 1
+
+    def stop_reason(self):
+        """Why the next target should not start (None to continue); assumes it costs the running mean"""
+        elapsed = time.time() - self.started
+        if self.max_wall_time is not None:
+            mean = elapsed / self.targets if self.targets else 0
+            if elapsed + mean > self.max_wall_time:
+                return f"wall-time budget of {self.max_wall_time}s reached after {round(elapsed, 1)}s"
+        if self.max_tokens is not None:
+            mean = self.tokens / self.targets if self.targets else 0
+            if self.tokens + mean > self.max_tokens:
+                return f"token budget of {self.max_tokens} reached after {self.tokens} tokens"
+        return None
+
+    def as_dict(self):
+        return {
+            "max_wall_time": self.max_wall_time,
+            "max_tokens": self.max_tokens,
+            "wall_time": round(time.time() - self.started, 3),
+            "tokens": self.tokens,
+            "targets": self.targets
+        }
+
+
+def write_schedule(ranked, session_tag, budget=None, stopped=None):
+    """Write run_results/<session>/outputs/schedule.json"""
+    path = os.path.join("run_results", session_tag, "outputs", "schedule.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "session": session_tag,
+            "budget": budget.as_dict() if budget else None,
+            "stopped": stopped,
+            "targets": [{k: v for k, v in entry.items() if k != "file"} for entry in ranked]
+        }, f, indent=2)
+    return path
+
+
+def load_schedule(session_tag, base_dir="."):
+    """{target: schedule entry} of a session, or {} without a schedule"""
+    path = os.path.join(base_dir, "run_results", session_tag, "outputs", "schedule.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {entry["target"]: entry for entry in json.load(f).get("targets", [])}
+
+
+def run_llm(session_tag, targets, budget, cascade_path=None):
+    """Run LLM detection on merged-result targets in descending risk within the budget"""
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, "llm"))
+    from run_llm_experiments import SRC_DIR, run_experiment
+
+    ranked = rank_targets([os.path.join(SRC_DIR, f"{t}.py") for t in targets], session_tag)
+    stopped = None
+    for entry in ranked:
+        stopped = budget.stop_reason()
+        if stopped:
+            print(f"[!] Stopping: {stopped}")
+            break
+        print(f"\n[*] [{entry['rank']}/{len(ranked)}] {entry['target']} (risk {entry['score']})")
+        entry["status"] = "done" if run_experiment(entry["target"], "C1", session_tag, cascade_path) else "skipped"
+        budget.charge(target_tokens(session_tag, entry["target"]))
+        write_schedule(ranked, session_tag, budget)
+
+    for entry in ranked:
+        if entry["status"] == "pending":
+            entry["status"] = "not_run"
+    write_schedule(ranked, session_tag, budget, stopped)
+    return ranked, stopped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Risk-prioritised scheduling with wall-time and token budgets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rank_parser = subparsers.add_parser("rank", help="Print source files in descending risk")
+    rank_parser.add_argument("files", nargs="+", help="Target .py files")
+
+    run_parser = subparsers.add_parser("run", help="LLM stage over targets with merged results, highest risk first")
+    run_parser.add_argument("--max-wall-time", type=float, help="Stop starting new targets after this many seconds")
+    run_parser.add_argument("--max-tokens", type=int, help="Stop starting new targets after this many LLM tokens")
+    run_parser.add_argument("--cascade", help="Cascade configuration JSON for the LLM stage")
+    run_parser.add_argument("--target", action="append", help="Restrict to these targets (repeatable)")
+
+    for sub in (rank_parser, run_parser):
+        sub.add_argument("--session", required=True, help="Session tag")
+    args = parser.parse_args()
+
+    if args.command == "rank":
+        ranked = rank_targets(args.files, args.session)
+        write_schedule(ranked, args.session)
+        for entry in ranked:
+            print(entry["file"])
+        return
+
+    merged_base = os.path.join("run_results", args.session, "outputs")
+    targets = []
+    for merged_file in sorted(glob.glob(os.path.join(merged_base, "*", "merged_results.json"))):
+        target = os.path.basename(os.path.dirname(merged_file))
+        if args.target and target not in args.target:
+            continue
+        with open(merged_file, "r") as f:
+            if "".join(f.read().split()) == "{}":
+                continue
+        targets.append(target)
+    if not targets:
+        print("[!] No targets with merged results found")
+        sys.exit(1)
+
+    ranked, stopped = run_llm(args.session, targets, Budget(args.max_wall_time, args.max_tokens), args.cascade)
+    done = sum(1 for entry in ranked if entry["status"] == "done")
+    print(f"[✓] {done}/{len(ranked)} targets analysed" + (f" ({stopped})" if stopped else ""))
+
+    from result import summarize
+    summarize(args.session)
+
+
+if __name__ == "__main__":
+    main()